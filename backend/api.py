@@ -1,26 +1,90 @@
+import asyncio
 import os
+import uuid
 from pathlib import Path
-from typing import Dict, Any, Optional, Union
+from typing import Callable, Dict, Any, Optional, Union
 
 from ceylon_rag.interfaces.schemas import QueryResult
 from rag.app import CodeAnalysisRAG
+from rag.metrics import METRICS
+from rag.registry import ProjectRegistry
+from rag.sniff import SKIP_REASONS
+from rag.watcher import ProjectWatcher
 
 # Global state to maintain RAG instance
-_rag = None
+_rag: Optional[CodeAnalysisRAG] = None
+_registry: Optional[ProjectRegistry] = None
+_project_root: Optional[str] = None
+_watcher: Optional[ProjectWatcher] = None
 _initialized = False
+_progress: Dict[str, Any] = {}
+_push: Optional[Callable[..., None]] = None
 
 
-async def open_project(file_path: Union[str, Path]):
-    """Open a new project and reset the RAG system"""
-    global _initialized
+def set_push_channel(push: Callable[..., None]):
+    """Register the function used to push streamed data to the UI (WVAsync.push)"""
+    global _push
+    _push = push
+
+
+async def open_project(file_path: Union[str, Path]) -> Dict[str, str]:
+    """Switch to the project at file_path, reusing its warm RAG instance if any"""
+    global _rag, _project_root
     print(file_path)
-    _initialized = False
-    await initialize_rag()
+    if not _initialized:
+        _project_root = str(file_path)
+        return await initialize_rag()
+
+    rag = await _switch_project(file_path)
+    return {"status": "Project opened", "table_name": rag.config["vector_store"]["table_name"]}
+
+
+async def _switch_project(root: Optional[Union[str, Path]]) -> CodeAnalysisRAG:
+    """Make root the current project; its instance stays pinned while it is current"""
+    global _rag, _project_root
+    rag = await _registry.open(root, pin=True)
+    previous, _rag = _rag, rag
+    _project_root = str(root) if root else None
+    if previous is not None:
+        await _registry.release(previous)
+    if previous is not rag:
+        # The watcher feeds changes to the instance and root it was started with
+        await _watch_project()
+    return rag
+
+
+async def _watch_project():
+    """Re-index the open project's files as they change, pushing `index.updated`"""
+    global _watcher
+    if _watcher is not None:
+        await _watcher.stop()
+        _watcher = None
+    if not _project_root or not _rag.config.get("watch", True):
+        return
+
+    def on_update(counts: Dict[str, int]):
+        if _push:
+            _push("index.updated", {"root_path": _project_root, **counts})
+
+    _watcher = ProjectWatcher(
+        _rag,
+        _project_root,
+        debounce_ms=_rag.config.get("watch_debounce_ms", 1600),
+        on_update=on_update
+    )
+    _watcher.start()
+
+
+async def list_projects(_=None):
+    """Return the known projects, most recently opened first"""
+    if not _initialized:
+        raise RuntimeError("RAG system not initialized. Call initialize_rag() first.")
+    return _registry.list_projects()
 
 
 async def initialize_rag(config: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
     """Initialize the RAG system with optional custom configuration"""
-    global _rag, _initialized
+    global _rag, _registry, _initialized
 
     if _initialized:
         return {"status": "RAG system already initialized"}
@@ -46,8 +110,27 @@ async def initialize_rag(config: Optional[Dict[str, Any]] = None) -> Dict[str, s
             "db_path": "./data/lancedb",
             "table_name": "code_documents"
         },
-        "chunk_size": 1000,
+        "embedding_scheduler": {
+            "max_batch_size": 16,
+            "max_batch_tokens": 8000,
+            "max_in_flight": 2
+        },
+        "chunker": "syntax",
+        "chunk_size": 1500,
         "chunk_overlap": 200,
+        "context_budget": {"default": 3000},
+        # Chunk text is read back from the watched source files instead of stored
+        "store_content": False,
+        "sniff": {
+            "max_file_bytes": 1_000_000
+        },
+        "project_pool_size": 3,
+        "metrics": {
+            # Set to a file path to export Prometheus text format
+            "prometheus_path": None
+        },
+        "watch": True,
+        "watch_debounce_ms": 1600,
         "excluded_dirs": [
             "venv", "node_modules", ".git", "__pycache__",
             "build", "dist", "tests/fixtures"
@@ -62,8 +145,9 @@ async def initialize_rag(config: Optional[Dict[str, Any]] = None) -> Dict[str, s
     }
 
     final_config = config if config else default_config
-    _rag = CodeAnalysisRAG(final_config)
-    await _rag.initialize()
+    _registry = ProjectRegistry(final_config, pool_size=final_config.get("project_pool_size", 3))
+    _rag = None
+    await _switch_project(_project_root)
     _initialized = True
 
     return {"status": "RAG system initialized successfully"}
@@ -72,31 +156,94 @@ async def initialize_rag(config: Optional[Dict[str, Any]] = None) -> Dict[str, s
 async def process_codebase(root_path: Union[str, Path],
                            recursive: bool = True) -> Dict[str, Any]:
     """Process and index a codebase from the given path"""
-    global _rag, _initialized
+    global _rag, _initialized, _progress
 
     if not _initialized:
         raise RuntimeError("RAG system not initialized. Call initialize_rag() first.")
 
+    def on_progress(counts: Dict[str, int]):
+        _progress.update(counts)
+
+    _progress = {"status": "running", "root_path": str(root_path)}
     try:
-        documents = await _rag.process_codebase(root_path, recursive)
-        await _rag.index_code(documents)
+        # Each project root is indexed into its own table and becomes the current project
+        rag = await _switch_project(root_path)
+        async with _registry.pinned(rag):
+            counts = await rag.index_codebase(root_path, recursive, progress_callback=on_progress)
+        _progress["status"] = "done"
+        _export_metrics()
 
         return {
             "status": "success",
-            "processed_documents": len(documents),
-            "message": f"Successfully processed and indexed {len(documents)} code segments"
+            "processed_documents": counts["documents"],
+            "processed_files": counts["files"],
+            "removed_files": counts["removed_files"],
+            "skipped_files": {
+                reason: counts[f"skipped_{reason}"] for reason in SKIP_REASONS if counts[f"skipped_{reason}"]
+            },
+            "message": f"Successfully processed and indexed {counts['documents']} code segments"
         }
 
     except Exception as e:
+        _progress["status"] = "error"
         return {
             "status": "error",
             "message": f"Error processing codebase: {str(e)}"
         }
 
 
+async def get_progress(_=None) -> Dict[str, Any]:
+    """Return the running counts of the current or last indexing run"""
+    return dict(_progress)
+
+
+async def get_metrics(_=None) -> Dict[str, Any]:
+    """Return a snapshot of pipeline counters and per-stage timings"""
+    snapshot = METRICS.snapshot()
+    if _rag is not None and _rag.query_cache is not None:
+        snapshot["query_cache"] = {"entries": len(_rag.query_cache),
+                                   "hits": _rag.query_cache.hits,
+                                   "misses": _rag.query_cache.misses}
+    if _rag is not None and _rag.embedding_cache is not None:
+        snapshot["embedding_cache"] = await asyncio.to_thread(_rag.embedding_cache.stats)
+    _export_metrics()
+    return snapshot
+
+
+def _export_metrics():
+    """Write the Prometheus text export if `metrics.prometheus_path` is configured"""
+    if _rag is None:
+        return
+    path = _rag.config.get("metrics", {}).get("prometheus_path")
+    if not path:
+        return
+    try:
+        METRICS.write_prometheus(path)
+    except OSError as e:
+        print(f"Error writing metrics to {path}: {str(e)}")
+
+
+def _source_entry(doc) -> Dict[str, Any]:
+    """Describe a retrieved chunk by file and exact line range"""
+    metadata = doc.metadata
+    return {
+        "file_path": metadata.get("file_path"),
+        "language": metadata.get("language"),
+        # Line numbers are 1-based and inclusive; None for chunks without provenance
+        "start_line": metadata.get("start_line") or None,
+        "end_line": metadata.get("end_line") or None,
+        "symbol": metadata.get("symbol") or None,
+        "source_changed": bool(metadata.get("source_changed")),
+        "snippet": doc.content[:200] + ("..." if len(doc.content) > 200 else "")
+    }
+
+
 async def analyze_code(question: str,
                        filter_criteria: Optional[Dict[str, Any]] = None,
-                       top_k: int = 5) -> Dict[str, Any]:
+                       top_k: int = 5,
+                       nprobes: Optional[int] = None,
+                       refine_factor: Optional[int] = None,
+                       retrieval: Optional[str] = None) -> Dict[str, Any]:
     """Analyze code using the RAG system"""
     global _rag, _initialized
 
@@ -104,23 +251,22 @@ async def analyze_code(question: str,
         raise RuntimeError("RAG system not initialized. Call initialize_rag() first.")
 
     try:
-        result: QueryResult = await _rag.analyze_code(
-            question=question,
-            filter_criteria=filter_criteria,
-            top_k=top_k
-        )
+        # Pinned so that switching projects meanwhile does not close it mid-query
+        async with _registry.pinned(_rag) as rag:
+            result: QueryResult = await rag.analyze_code(
+                question=question,
+                filter_criteria=filter_criteria,
+                top_k=top_k,
+                nprobes=nprobes,
+                refine_factor=refine_factor,
+                retrieval=retrieval
+            )
+        _export_metrics()
 
         return {
             "status": "success",
             "response": result.response,
-            "sources": [
-                {
-                    "file_path": doc.metadata.get("file_path"),
-                    "language": doc.metadata.get("language"),
-                    "snippet": doc.content[:200] + "..."  # First 200 chars of each source
-                }
-                for doc in result.source_documents
-            ],
+            "sources": [_source_entry(doc) for doc in result.source_documents],
             "metadata": result.metadata
         }
 
@@ -131,12 +277,60 @@ async def analyze_code(question: str,
         }
 
 
+async def analyze_code_stream(question: str,
+                              filter_criteria: Optional[Dict[str, Any]] = None,
+                              top_k: int = 5,
+                              retrieval: Optional[str] = None,
+                              stream_id: Optional[str] = None) -> Dict[str, Any]:
+    """Analyze code, pushing sources and response tokens to the UI as they are produced
+
+    Messages are pushed on the `analysis.sources`, `analysis.token`,
+    `analysis.done` and `analysis.error` channels tagged with `stream_id`.
+    """
+    global _rag, _initialized
+
+    if not _initialized:
+        raise RuntimeError("RAG system not initialized. Call initialize_rag() first.")
+
+    stream_id = stream_id or uuid.uuid4().hex
+    push = _push or (lambda *args, **kwargs: None)
+    try:
+        async with _registry.pinned(_rag) as rag:
+            results = await rag.retrieve(question, filter_criteria, top_k, retrieval)
+            push("analysis.sources", [_source_entry(doc) for doc in results], stream=stream_id)
+
+            response = []
+            async for token in rag.generate_stream(question, results):
+                response.append(token)
+                push("analysis.token", token, stream=stream_id)
+        push("analysis.done", None, stream=stream_id)
+        _export_metrics()
+
+        return {
+            "status": "success",
+            "stream_id": stream_id,
+            "response": "".join(response)
+        }
+
+    except Exception as e:
+        push("analysis.error", str(e), stream=stream_id)
+        return {
+            "status": "error",
+            "stream_id": stream_id,
+            "message": f"Error analyzing code: {str(e)}"
+        }
+
+
 async def close() -> Dict[str, str]:
     """Clean up RAG system resources"""
-    global _rag, _initialized
+    global _rag, _registry, _watcher, _initialized
 
-    if _rag:
-        await _rag.close()
+    if _watcher:
+        await _watcher.stop()
+        _watcher = None
+    if _registry:
+        await _registry.close()
+        _rag, _registry = None, None
         _initialized = False
         return {"status": "RAG system resources cleaned up"}
     return {"status": "No RAG system to clean up"}
@@ -0,0 +1,245 @@
+"""Benchmark the indexing and query hot paths against a synthetic repository
+
+Run from the backend directory, e.g.
+
+    python -m bench.run --files 1000 --queries 100 --output bench.json
+    python -m bench.run --files 1000 --compare bench.json
+
+Embedding and generation use the deterministic stubs in `bench.stubs`, so
+results measure this code (walk, chunking, scheduling, LanceDB) rather than
+a model server; pass latencies to the stubs to model one.
+"""
+import argparse
+import asyncio
+import json
+import math
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from bench.stubs import StubEmbedder, StubLLM
+from bench.synthetic import DEFAULT_MIX, generate_queries, generate_repo, parse_mix
+from rag.app import CodeAnalysisRAG, SharedClients
+from rag.embedding import EmbeddingScheduler
+from rag.metrics import METRICS
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile, q in [0, 100]"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered), max(1, math.ceil(q / 100 * len(ordered)))) - 1]
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, Any]:
+    return {
+        "count": len(latencies),
+        "mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else None,
+        "p50_ms": percentile(latencies, 50) * 1000 if latencies else None,
+        "p95_ms": percentile(latencies, 95) * 1000 if latencies else None,
+    }
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def store_seconds() -> float:
+    return METRICS.snapshot()["spans"].get("index.store", {}).get("total_seconds", 0.0)
+
+
+def bench_config(workdir: Path, args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "llm": {"type": "stub", "model_name": "stub"},
+        "embedder": {"type": "stub", "model_name": "stub"},
+        "vector_store": {
+            "type": "lancedb",
+            "db_path": str(workdir / "lancedb"),
+            "table_name": "bench"
+        },
+        "embedding_scheduler": {
+            "max_batch_size": args.embed_batch_size,
+            "max_in_flight": args.embed_in_flight
+        },
+        "embedding_cache": {"enabled": False},
+        "query_cache": {"enabled": False},
+        "chunker": args.chunker,
+        "chunk_size": args.chunk_size,
+        "load_mode": args.load_mode,
+        "index_batch_size": args.index_batch_size,
+        "watch": False,
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="coderag-bench-"))
+    repo = workdir / "repo"
+    if repo.exists():
+        shutil.rmtree(repo)
+    shutil.rmtree(workdir / "lancedb", ignore_errors=True)
+
+    started = time.perf_counter()
+    language_counts = generate_repo(repo, args.files, parse_mix(args.mix) if args.mix else DEFAULT_MIX,
+                                    units_per_file=args.units, seed=args.seed)
+    report: Dict[str, Any] = {
+        "params": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "repo": {"languages": language_counts, "generate_seconds": time.perf_counter() - started},
+        "stages": {},
+    }
+    stages = report["stages"]
+
+    config = bench_config(workdir, args)
+    embedder = StubEmbedder(latency=args.embed_latency, per_text_latency=args.embed_text_latency)
+    llm = StubLLM(first_token_latency=args.llm_latency, token_latency=args.llm_token_latency)
+    clients = SharedClients(llm, embedder, None, EmbeddingScheduler(embedder, **config["embedding_scheduler"]))
+    rag = CodeAnalysisRAG(config)
+    await rag.initialize(clients)
+
+    try:
+        # Walk
+        started = time.perf_counter()
+        files = list(rag.walker.walk(repo))
+        stages["walk"] = {"seconds": time.perf_counter() - started, "files": len(files)}
+
+        # Load + chunk, one file at a time
+        started = time.perf_counter()
+        documents = []
+        stage_seconds = {"load": 0.0, "chunk": 0.0}
+        for file_path, _ in files:
+            file_docs, timings = await rag._load_file(file_path, rag._get_language(file_path))
+            documents.extend(file_docs)
+            for stage, seconds in timings.items():
+                stage_seconds[stage] += seconds
+        elapsed = time.perf_counter() - started
+        stages["load_chunk"] = {"seconds": elapsed, "load_seconds": stage_seconds["load"],
+                                "chunk_seconds": stage_seconds["chunk"], "chunks": len(documents),
+                                "files_per_second": len(files) / elapsed if elapsed else None}
+
+        # Embed through the scheduler
+        started = time.perf_counter()
+        for start in range(0, len(documents), args.index_batch_size):
+            await rag.embedding_scheduler.embed_documents(documents[start:start + args.index_batch_size])
+        elapsed = time.perf_counter() - started
+        stages["embed"] = {"seconds": elapsed, "chunks_per_second": len(documents) / elapsed if elapsed else None}
+
+        # End-to-end streaming index; table writes are timed by the index.store span
+        store_before = store_seconds()
+        started = time.perf_counter()
+        counts = await rag.index_codebase(repo)
+        elapsed = time.perf_counter() - started
+        stages["store"] = {"seconds": store_seconds() - store_before}
+        stages["index"] = {
+            "seconds": elapsed,
+            "files": counts["files"],
+            "chunks": counts["documents"],
+            "files_per_second": counts["files"] / elapsed if elapsed else None,
+            "chunks_per_second": counts["documents"] / elapsed if elapsed else None,
+        }
+
+        # Incremental re-run with nothing changed
+        started = time.perf_counter()
+        await rag.index_codebase(repo)
+        stages["reindex_unchanged"] = {"seconds": time.perf_counter() - started}
+
+        # Retrieval per mode, then full analyze_code with the stub LLM
+        queries = generate_queries(args.queries, args.seed)
+        for mode in ("vector", "lexical", "hybrid", "rerank"):
+            latencies = []
+            for question in queries:
+                started = time.perf_counter()
+                await rag.retrieve(question, top_k=args.top_k, retrieval=mode)
+                latencies.append(time.perf_counter() - started)
+            stages[f"search_{mode}"] = latency_summary(latencies)
+
+        latencies = []
+        for question in queries:
+            started = time.perf_counter()
+            await rag.analyze_code(question, top_k=args.top_k)
+            latencies.append(time.perf_counter() - started)
+        stages["generate"] = latency_summary(latencies)
+        stages["generate"]["mean_prompt_chars"] = llm.prompt_chars / len(queries) if queries else None
+
+    finally:
+        await rag.close()
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report["embedder"] = {"calls": embedder.calls, "texts": embedder.texts}
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def _metrics(report: Dict[str, Any]) -> Dict[str, float]:
+    """Flatten comparable lower-is-better metrics"""
+    metrics = {}
+    for stage, values in report["stages"].items():
+        for key in ("seconds", "p50_ms", "p95_ms"):
+            if values.get(key) is not None:
+                metrics[f"{stage}.{key}"] = values[key]
+    if report.get("peak_rss_mb") is not None:
+        metrics["peak_rss_mb"] = report["peak_rss_mb"]
+    return metrics
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    current, previous = _metrics(report), _metrics(baseline)
+    lines = [f"{'metric':<32}{'baseline':>12}{'current':>12}{'change':>10}"]
+    for name, value in current.items():
+        if name in previous and previous[name]:
+            change = (value - previous[name]) / previous[name] * 100
+            lines.append(f"{name:<32}{previous[name]:>12.3f}{value:>12.3f}{change:>+9.1f}%")
+    return lines
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=500, help="source files in the synthetic repo")
+    parser.add_argument("--mix", help="language mix, e.g. python:0.6,javascript:0.4")
+    parser.add_argument("--units", type=int, default=6, help="typical functions/classes per file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--chunker", choices=("syntax", "text"), default="syntax")
+    parser.add_argument("--chunk-size", type=int, default=1500)
+    parser.add_argument("--load-mode", choices=("async", "thread", "process"), default="async")
+    parser.add_argument("--index-batch-size", type=int, default=64)
+    parser.add_argument("--embed-batch-size", type=int, default=32)
+    parser.add_argument("--embed-in-flight", type=int, default=2)
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="stub seconds per embed call")
+    parser.add_argument("--embed-text-latency", type=float, default=0.0, help="stub seconds per embedded text")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="stub seconds to first token")
+    parser.add_argument("--llm-token-latency", type=float, default=0.0, help="stub seconds per token")
+    parser.add_argument("--workdir", help="where to build the repo and database (default: temp dir)")
+    parser.add_argument("--keep", action="store_true", help="keep the temp workdir afterwards")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    report = asyncio.run(run_benchmark(args))
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print("\n".join(compare(report, json.load(f))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import asyncio
+import hashlib
+import math
+from typing import Any, List, Optional
+
+from ceylon_rag.interfaces.embedder import Embedder
+from ceylon_rag.interfaces.llm import LLM
+
+from rag.lexical import tokenize
+
+
+class StubEmbedder(Embedder):
+    """Deterministic feature-hashing embedder with a simulated per-call latency
+
+    Texts sharing identifiers get similar vectors, so retrieval over a
+    synthetic repo behaves plausibly without a model server. Like the
+    ceylon-rag embedders it returns plain float lists and reports `ndims`.
+    """
+
+    def __init__(self, dimension: int = 384, latency: float = 0.0, per_text_latency: float = 0.0):
+        self.dimension = dimension
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.calls = 0
+        self.texts = 0
+
+    def embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        for token in tokenize(text):
+            digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+            value = int.from_bytes(digest, 'little')
+            vector[value % self.dimension] += 1.0 if value >> 63 else -1.0
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    async def _wait(self, count: int):
+        self.calls += 1
+        self.texts += count
+        if self.latency or self.per_text_latency:
+            await asyncio.sleep(self.latency + self.per_text_latency * count)
+
+    def ndims(self) -> int:
+        return self.dimension
+
+    async def embed_documents(self, documents: List[Any]) -> List[List[float]]:
+        await self._wait(len(documents))
+        return [self.embed(doc.content) for doc in documents]
+
+    async def embed_query(self, text: str) -> List[float]:
+        await self._wait(1)
+        return self.embed(text)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+class StubLLM(LLM):
+    """Emits numbered tokens after a fixed time-to-first-token and per-token delay
+
+    Like the ceylon-rag LLMs it only offers `generate` and `streaming_generate`.
+    """
+
+    def __init__(self, first_token_latency: float = 0.0, token_latency: float = 0.0, tokens: int = 64):
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.tokens = tokens
+        self.prompt_chars = 0
+
+    async def streaming_generate(self, prompt: str, system_prompt: Optional[str] = None):
+        self.prompt_chars += len(prompt)
+        if self.first_token_latency:
+            await asyncio.sleep(self.first_token_latency)
+        for number in range(self.tokens):
+            if self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            yield f"token{number} "
+
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        return ''.join([token async for token in self.streaming_generate(prompt, system_prompt)])
+
+    async def __aexit__(self, *args):
+        pass
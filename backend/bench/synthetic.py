@@ -0,0 +1,143 @@
+import random
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+# Identifier vocabulary shared with the generated queries, so searches hit
+WORDS = [
+    'user', 'account', 'session', 'token', 'cache', 'index', 'query', 'parse',
+    'render', 'load', 'store', 'fetch', 'update', 'delete', 'config', 'event',
+    'handler', 'stream', 'buffer', 'vector', 'search', 'report', 'payment',
+    'invoice', 'order', 'queue', 'worker', 'schema', 'router', 'client',
+]
+
+EXTENSIONS = {'python': 'py', 'javascript': 'js', 'go': 'go', 'markdown': 'md'}
+
+DEFAULT_MIX = {'python': 0.5, 'javascript': 0.3, 'go': 0.1, 'markdown': 0.1}
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse a language mix like `python:0.6,javascript:0.4`"""
+    mix = {}
+    for part in spec.split(','):
+        language, _, weight = part.partition(':')
+        language = language.strip()
+        if language not in EXTENSIONS:
+            raise ValueError(f"Unsupported language: {language}. Expected one of {list(EXTENSIONS)}")
+        mix[language] = float(weight or 1)
+    return mix
+
+
+def _name(rng: random.Random, parts: int = 2) -> str:
+    return '_'.join(rng.choice(WORDS) for _ in range(parts))
+
+
+def _camel(name: str) -> str:
+    head, *tail = name.split('_')
+    return head + ''.join(word.title() for word in tail)
+
+
+def _python_file(rng: random.Random, units: int) -> str:
+    out = ['import os\nimport json\n\n']
+    for _ in range(units):
+        if rng.random() < 0.3:
+            cls = ''.join(word.title() for word in _name(rng).split('_'))
+            out.append(f'class {cls}:\n    """{cls} manages {_name(rng, 3).replace("_", " ")}"""\n\n')
+            for _ in range(rng.randint(2, 5)):
+                method = _name(rng)
+                out.append(f'    def {method}(self, {rng.choice(WORDS)}, {rng.choice(WORDS)}=None):\n')
+                out.extend(f'        {_name(rng)} = self.{_name(rng)}({rng.choice(WORDS)})\n'
+                           for _ in range(rng.randint(2, 8)))
+                out.append(f'        return {rng.choice(WORDS)}\n\n')
+        else:
+            function = _name(rng)
+            out.append(f'def {function}({rng.choice(WORDS)}, {rng.choice(WORDS)}):\n')
+            out.extend(f'    {_name(rng)} = {_name(rng)}({rng.choice(WORDS)})\n' for _ in range(rng.randint(3, 12)))
+            out.append(f'    return {rng.choice(WORDS)}\n\n\n')
+    return ''.join(out)
+
+
+def _javascript_file(rng: random.Random, units: int) -> str:
+    out = ["import { client } from './client';\n\n"]
+    for _ in range(units):
+        function = _camel(_name(rng))
+        out.append(f'export async function {function}({rng.choice(WORDS)}, options = {{}}) {{\n')
+        out.extend(f'  const {_camel(_name(rng))} = await {_camel(_name(rng))}({rng.choice(WORDS)});\n'
+                   for _ in range(rng.randint(3, 12)))
+        out.append(f'  return {rng.choice(WORDS)};\n}}\n\n')
+    return ''.join(out)
+
+
+def _go_file(rng: random.Random, units: int) -> str:
+    out = ['package main\n\nimport "fmt"\n\n']
+    for _ in range(units):
+        function = ''.join(word.title() for word in _name(rng).split('_'))
+        out.append(f'func {function}({rng.choice(WORDS)} string) error {{\n')
+        out.extend(f'\t{_camel(_name(rng))} := {_camel(_name(rng))}({rng.choice(WORDS)})\n'
+                   for _ in range(rng.randint(3, 12)))
+        out.append(f'\tfmt.Println({rng.choice(WORDS)})\n\treturn nil\n}}\n\n')
+    return ''.join(out)
+
+
+def _markdown_file(rng: random.Random, units: int) -> str:
+    out = [f'# {_name(rng, 3).replace("_", " ").title()}\n\n']
+    for _ in range(units):
+        out.append(f'## {_name(rng).replace("_", " ").title()}\n\n')
+        out.extend(' '.join(rng.choice(WORDS) for _ in range(14)) + '.\n' for _ in range(rng.randint(2, 6)))
+        out.append('\n')
+    return ''.join(out)
+
+
+_GENERATORS = {
+    'python': _python_file,
+    'javascript': _javascript_file,
+    'go': _go_file,
+    'markdown': _markdown_file,
+}
+
+
+def generate_repo(root: Union[str, Path],
+                  files: int = 200,
+                  mix: Optional[Dict[str, float]] = None,
+                  units_per_file: int = 6,
+                  depth: int = 3,
+                  seed: int = 0) -> Dict[str, int]:
+    """Write a deterministic synthetic codebase under root
+
+    Besides the requested source files, an excluded `node_modules` tree and a
+    `.gitignore`d `generated` directory are added so exclusion rules do work
+    during the walk. Returns the number of source files per language.
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    mix = mix or DEFAULT_MIX
+    languages, weights = list(mix), list(mix.values())
+    directories = ['/'.join(_name(rng, 1) + str(rng.randint(0, 9)) for _ in range(rng.randint(1, depth)))
+                   for _ in range(max(1, files // 20))]
+
+    counts = {language: 0 for language in languages}
+    for number in range(files):
+        language = rng.choices(languages, weights)[0]
+        path = root / rng.choice(directories) / f"{_name(rng)}_{number}.{EXTENSIONS[language]}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(_GENERATORS[language](rng, rng.randint(max(1, units_per_file // 2), units_per_file * 2)),
+                        encoding='utf-8')
+        counts[language] += 1
+
+    for excluded in ('node_modules/pkg', 'generated'):
+        (root / excluded).mkdir(parents=True, exist_ok=True)
+        for number in range(max(1, files // 10)):
+            (root / excluded / f"vendored_{number}.js").write_text(_javascript_file(rng, 2), encoding='utf-8')
+    (root / '.gitignore').write_text('generated/\n*.tmp\n', encoding='utf-8')
+    return counts
+
+
+def generate_queries(count: int, seed: int = 0) -> List[str]:
+    """Deterministic mix of natural-language and bare identifier questions"""
+    rng = random.Random(seed + 1)
+    queries = []
+    for number in range(count):
+        if number % 3 == 0:
+            queries.append(_name(rng))
+        else:
+            queries.append(f"How does the {rng.choice(WORDS)} {rng.choice(WORDS)} handle {rng.choice(WORDS)}?")
+    return queries
@@ -93,11 +93,16 @@ class Js(JsApi):
 if __name__ == "__main__":
     wv_app = WVAsync()
     js_api = Js(wv_app.jq)
-
-    wv_app.registry("open_project", rag_api.open_project)
-    wv_app.registry("initialize_rag", rag_api.initialize_rag)
-    wv_app.registry("analyze_code", rag_api.analyze_code)
-    wv_app.registry("process_codebase", rag_api.process_codebase)
+    rag_api.set_push_channel(wv_app.push)
+
+    wv_app.registry("open_project", rag_api.open_project, max_concurrency=1)
+    wv_app.registry("initialize_rag", rag_api.initialize_rag, max_concurrency=1, coalesce=True)
+    wv_app.registry("analyze_code", rag_api.analyze_code, max_concurrency=1, coalesce=True)
+    wv_app.registry("analyze_code_stream", rag_api.analyze_code_stream, max_concurrency=1, coalesce=True)
+    wv_app.registry("process_codebase", rag_api.process_codebase, max_concurrency=1, coalesce=True)
+    wv_app.registry("get_progress", rag_api.get_progress)
+    wv_app.registry("list_projects", rag_api.list_projects)
+    wv_app.registry("get_metrics", rag_api.get_metrics)
 
     window = webview.create_window("Ceylon AI - Dev Friend", entry, js_api=js_api)
     window.expose(open_file_dialog)
@@ -1,38 +1,95 @@
 import asyncio
+import json
 import os
+import time
+from collections import Counter
+from contextlib import aclosing
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, AsyncIterator, Callable, List, Optional, Sequence, Tuple, Union
 
 from ceylon_rag.factory.component_factory import AsyncComponentFactory
-from ceylon_rag.impl.loaders.text_loader import TextLoader, TextLoaderConfig
 from ceylon_rag.interfaces.schemas import Document, QueryResult
 
-from utils.file_path_to_index import path_to_int64
+from rag.chunks import Chunk, ChunkBatch, FileInfo
+from rag.context import ContextAssembler, resolve_context_budget
+from rag.embedding import EmbeddingScheduler
+from rag.embedding_cache import EmbeddingCache
+from rag.file_ids import FileIdTable
+from rag.lexical import LexicalIndex, is_symbol_query, reciprocal_rank_fusion
+from rag.loading import CodeFileLoader, create_load_executor, load_in_executor
+from rag.manifest import FileManifest, FileRecord
+from rag.metrics import METRICS
+from rag.pipeline import DocumentBatch, FileChunks, batch_file_chunks, buffered, ordered_map
+from rag.query_cache import QueryCache
+from rag.rerank import Reranker
+from rag.sniff import SKIP_REASONS, FileSniffer
+from rag.source import SourceReader
+from rag.store import CodeTable, build_filter, vector_matrix
+from rag.walker import IGNORE_FILE_NAMES, CodebaseWalker
 
 
 class CodeDocument(Document):
     """Extended Document class with code-specific metadata"""
 
     @classmethod
-    def from_document(cls, doc: Document, file_path: str, language: str,
-                      code_type: str = "source") -> 'CodeDocument':
-        """Create CodeDocument from base Document with code-specific metadata"""
+    def from_row(cls, row: Dict[str, Any]) -> 'CodeDocument':
+        """Create CodeDocument from a raw LanceDB search result row"""
+        metadata = {key: value for key, value in row.items()
+                    if key not in ("vector", "content", "id", "doc_id", "created_at", "_distance")}
+        # The table does not store the duplicate url column
+        metadata.setdefault("url", metadata.get("file_path"))
+        if "_distance" in row:
+            metadata["distance"] = row["_distance"]
         return cls(
-            content=doc.content,
-            metadata={
-                **doc.metadata,
-                "file_path": file_path,
-                "url": file_path,
-                "language": language,
-                "code_type": code_type,
-                "file_name": Path(file_path).name,
-                "extension": Path(file_path).suffix[1:],
-                "index": path_to_int64(file_path)
-            },
-            doc_id=doc.doc_id,
-            created_at=doc.created_at
+            content=row["content"],
+            metadata=metadata,
+            doc_id=row.get("doc_id", row.get("id")),
+            **({"created_at": row["created_at"]} if row.get("created_at") else {})
+        )
+
+
+def create_embedding_cache(config: Dict[str, Any]) -> Optional[EmbeddingCache]:
+    """Open the shared embedding cache unless it is disabled in the config"""
+    cache_config = dict(config.get("embedding_cache", {}))
+    if not cache_config.pop("enabled", True):
+        return None
+    # Shared by every project, so it lives beside rather than inside the database
+    db_path = Path(config["vector_store"].get("db_path", "./data/lancedb"))
+    path = cache_config.pop("path", db_path.parent / "embedding_cache.sqlite")
+    return EmbeddingCache(path, **cache_config)
+
+
+@dataclass
+class SharedClients:
+    """Model clients that several CodeAnalysisRAG instances can share"""
+    llm: Any
+    embedder: Any
+    embedding_cache: Optional[EmbeddingCache]
+    embedding_scheduler: EmbeddingScheduler
+
+    @classmethod
+    async def create(cls, config: Dict[str, Any],
+                     factory: Optional[AsyncComponentFactory] = None) -> 'SharedClients':
+        factory = factory or AsyncComponentFactory(config)
+        llm = await factory.create_llm(**config["llm"])
+        embedder = await factory.create_embedder(**config["embedder"])
+        embedding_cache = create_embedding_cache(config)
+        embedder_config = config["embedder"]
+        embedding_scheduler = EmbeddingScheduler(
+            embedder,
+            cache=embedding_cache,
+            cache_namespace=f"{embedder_config.get('type')}:{embedder_config.get('model_name')}",
+            **config.get("embedding_scheduler", {})
         )
+        return cls(llm, embedder, embedding_cache, embedding_scheduler)
+
+    async def close(self):
+        await self.llm.__aexit__(None, None, None)
+        await self.embedder.__aexit__(None, None, None)
+        if self.embedding_cache:
+            self.embedding_cache.close()
 
 
 class CodeAnalysisRAG:
@@ -66,8 +123,65 @@ class CodeAnalysisRAG:
         self.factory = AsyncComponentFactory(config)
         self.llm = None
         self.embedder = None
-        self.vector_store = None
-        self.text_loader = TextLoader()
+        self.embedding_scheduler = None
+        self.embedding_cache = None
+        self.clients = None
+        self._owns_clients = True
+        self.file_loader = None
+        self.code_table = None
+
+        # Incremental indexing state
+        self.incremental = config.get('incremental', True)
+        self.manifest = None
+        self.lexical_index = None
+        self.file_ids = None
+        self._pending_files: Dict[str, FileRecord] = {}
+        self._removed_files: List[str] = []
+        # Serializes full index runs and watcher deltas on this table
+        self._index_lock = asyncio.Lock()
+
+        # Semantic cache of analyze_code results
+        query_cache_config = dict(config.get('query_cache', {}))
+        self.query_cache = None
+        if query_cache_config.pop('enabled', True):
+            self.query_cache = QueryCache(**query_cache_config)
+
+        # Binary, oversized, minified and generated files are skipped before loading
+        sniff_config = dict(config.get('sniff', {}))
+        self.sniffer = None
+        if sniff_config.pop('enabled', True):
+            self.sniffer = FileSniffer(**sniff_config)
+
+        # Local second stage of the "rerank" retrieval mode
+        self.reranker = Reranker(**config.get('rerank', {}))
+
+        # Prompt context packing, budgeted per LLM model
+        self.context_assembler = ContextAssembler(
+            max_tokens=resolve_context_budget(config),
+            **config.get('context_assembler', {})
+        )
+
+        # Streaming pipeline settings
+        self.batch_size = config.get('index_batch_size', 64)
+        self.queue_size = config.get('index_queue_size', 4)
+        # Embedded batches are buffered as Arrow record batches and appended
+        # to the table in writes of at least this many rows
+        self.store_batch_rows = config.get('store_batch_rows', 4096)
+        self._write_batches = []
+        self._write_rows = 0
+        self._write_chunks: List[Chunk] = []
+        self._write_stale: List[str] = []
+        self._write_files: List[FileChunks] = []
+        self._write_progress: Counter = Counter()
+        # Without stored chunk text, retrieved chunks are read back from the
+        # source files by byte range; that needs the manifest's codebase root
+        self.store_content = config.get('store_content', True) or not self.incremental
+
+        # File loading concurrency: "async" loads each file on the default
+        # thread pool, "thread"/"process" use a dedicated worker pool
+        self.load_mode = config.get('load_mode', 'async')
+        self.max_workers = config.get('max_workers', os.cpu_count() or 4)
+        self._load_executor = None
 
         # Initialize exclusion patterns
         self.excluded_dirs = set(config.get('excluded_dirs', [
@@ -91,28 +205,62 @@ class CodeAnalysisRAG:
         if ignore_file := config.get('ignore_file'):
             self.ignore_patterns = self._load_ignore_patterns(ignore_file)
 
-    async def initialize(self):
-        """Initialize RAG components"""
-        self.llm = await self.factory.create_llm(**self.config["llm"])
-        self.embedder = await self.factory.create_embedder(**self.config["embedder"])
-        self.vector_store = await self.factory.create_vector_store(
-            embedder=self.embedder,
-            **self.config["vector_store"]
+        self.walker = CodebaseWalker(
+            excluded_dirs=self.excluded_dirs,
+            excluded_files=self.excluded_files,
+            excluded_extensions=self.excluded_extensions,
+            included_extensions=self.LANGUAGE_EXTENSIONS,
+            languages=self.LANGUAGE_EXTENSIONS,
+            ignore_patterns=self.ignore_patterns,
+            ignore_file_names=config.get('ignore_file_names', IGNORE_FILE_NAMES)
         )
 
-        # Initialize text loader with code-specific chunking
-        self.text_loader.initialize(TextLoaderConfig(
-            chunk_size=self.config.get("chunk_size", 1000),
-            chunk_overlap=self.config.get("chunk_overlap", 200),
-            name="code_loader",
-            type="document_loader",
-            config={}
-        ))
+    async def initialize(self, clients: Optional['SharedClients'] = None):
+        """Initialize RAG components
+
+        `clients` lets several instances (one per project) share the LLM,
+        embedder and embedding cache; they are then left open by `close`.
+        """
+        self._owns_clients = clients is None
+        self.clients = clients or await SharedClients.create(self.config, self.factory)
+        self.llm = self.clients.llm
+        self.embedder = self.clients.embedder
+        self.embedding_cache = self.clients.embedding_cache
+        self.embedding_scheduler = self.clients.embedding_scheduler
+
+        store_config = self.config["vector_store"]
+        db_path = Path(store_config.get("db_path", "./data/lancedb"))
+        table_name = store_config.get("table_name", "code_documents")
+        self.code_table = CodeTable(db_path, table_name)
+        self.manifest = FileManifest(
+            self.config.get("manifest_path", db_path / f"{table_name}.manifest.json")
+        ).load()
+
+        # Initialize file loader with code-specific chunking
+        chunker = self.config.get("chunker", "syntax")
+        chunk_size = self.config.get("chunk_size", 1000)
+        chunk_overlap = self.config.get("chunk_overlap", 200)
+        chunk_settings = f"{chunker}:{chunk_size}:{chunk_overlap}"
+        if self.manifest.settings != chunk_settings:
+            # Chunks of unchanged files were produced with other settings
+            self.manifest.invalidate(chunk_settings)
+        if not await self.code_table.check_schema():
+            # The table was dropped, so every file has to be stored again
+            self.manifest.invalidate(chunk_settings)
+
+        self.file_ids = FileIdTable(db_path / f"{table_name}.file_ids.json").load()
+
+        self.lexical_index = LexicalIndex(db_path / f"{table_name}.lexical.db").load()
+        if not len(self.lexical_index) and self.manifest.files:
+            # Rebuild the lexical index; embeddings come back from the cache
+            self.manifest.invalidate(chunk_settings)
+        self.file_loader = CodeFileLoader(chunker, chunk_size, chunk_overlap)
+        self._load_executor = create_load_executor(self.load_mode, self.max_workers,
+                                                   chunker, chunk_size, chunk_overlap)
 
     def _get_language(self, file_path: Path) -> Optional[str]:
         """Determine programming language from file extension"""
-        ext = file_path.suffix.lower()[1:]
-        return self.LANGUAGE_EXTENSIONS.get(ext)
+        return self.walker.language_of(file_path.name)
 
     def _load_ignore_patterns(self, ignore_file: Union[str, Path]) -> List[str]:
         """Load ignore patterns from a file (similar to .gitignore)"""
@@ -125,95 +273,437 @@ class CodeAnalysisRAG:
                         if line.strip() and not line.startswith('#')]
         return patterns
 
-    def _matches_ignore_pattern(self, file_path: str) -> bool:
-        """Check if file path matches any ignore pattern"""
-        import fnmatch
-        normalized_path = str(file_path).replace('\\', '/')
+    def _should_process_file(self, file_path: Path, root_path: Optional[Path] = None) -> bool:
+        """Determine if a file should be processed based on configured exclusions
+
+        Applies the same rules as the codebase walk, including nested ignore
+        files, with `file_path` taken relative to `root_path` when given.
+        """
+        if root_path is not None:
+            return self.walker.should_process(root_path, str(Path(file_path).relative_to(root_path)))
+        return self.walker.should_process('.', str(file_path))
+
+    async def _iter_file_chunks(self,
+                                root_path: Union[str, Path],
+                                recursive: bool = True) -> AsyncIterator[FileChunks]:
+        """Walk the codebase and yield the chunks of every new or changed file
+
+        With incremental indexing enabled, files whose content is unchanged since
+        the last index run are skipped, and files that disappeared are yielded
+        as removals once the walk completes.
+        """
+        root_path = Path(root_path)
+        if not root_path.exists():
+            raise FileNotFoundError(f"Directory not found: {root_path}")
+
+        incremental = self.incremental and self.manifest is not None
+        if incremental and self.manifest.root != str(root_path.resolve()):
+            # Rows of the previous codebase would otherwise outlive its manifest
+            self.manifest.reset(str(root_path.resolve()))
+            await self.code_table.clear()
+            self.file_ids.clear()
+            self.lexical_index.clear()
+            if self.query_cache is not None:
+                self.query_cache.clear()
+
+        seen_files = set()
+        self.walker.clear_cache()
 
-        for pattern in self.ignore_patterns:
-            if pattern.startswith('!'):  # Negation pattern
-                if fnmatch.fnmatch(normalized_path, pattern[1:]):
-                    return False
-            elif fnmatch.fnmatch(normalized_path, pattern):
-                return True
+        def candidates():
+            for file_path, relative_path in self.walker.walk(root_path, recursive):
+                seen_files.add(relative_path)
+                METRICS.inc("index.files_walked")
+                yield file_path, relative_path
 
-        return False
+        async def load(candidate) -> Optional[FileChunks]:
+            return await self._load_file_chunks(*candidate, incremental)
 
-    def _should_process_file(self, file_path: Path) -> bool:
-        """Determine if a file should be processed based on configured exclusions"""
-        # Convert to string and normalize path separators
-        path_str = str(file_path).replace('\\', '/')
+        # Files are loaded concurrently but yielded in walk order
+        async with aclosing(ordered_map(candidates(), load, self.max_workers)) as loaded:
+            async for file_chunks in loaded:
+                if file_chunks is not None:
+                    yield file_chunks
 
-        # Check directory exclusions
-        if any(excluded_dir in path_str.split('/') for excluded_dir in self.excluded_dirs):
-            return False
+        if incremental:
+            for path in [path for path in self.manifest.files if path not in seen_files]:
+                yield FileChunks(relative_path=path, stale=True, removed=True)
 
-        # Check file name exclusions
-        if file_path.name in self.excluded_files:
-            return False
+    async def _iter_changed_chunks(self,
+                                   root_path: Path,
+                                   relative_paths: List[str]) -> AsyncIterator[FileChunks]:
+        """Yield the chunks of changed files and the removals of deleted ones
 
-        # Check extension exclusions
-        if file_path.suffix.lower() in self.excluded_extensions:
-            return False
+        A path naming a directory covers every indexed file below it, so
+        moved or deleted directories are handled as a whole.
+        """
+        incremental = self.incremental and self.manifest is not None
+        indexed = self.manifest.files if incremental else {}
+        candidates, removed = {}, set()
+        for relative_path in relative_paths:
+            file_path = root_path / relative_path
+            if file_path.is_file():
+                candidates[relative_path] = file_path
+            elif file_path.is_dir():
+                # Also covers ignore file edits: indexed files that the walk no
+                # longer yields are re-classified below and dropped if excluded
+                prefix = relative_path + '/' if relative_path else ''
+                if self.walker.should_descend(root_path, relative_path):
+                    for path, walk_path in self.walker.walk(file_path):
+                        candidates[prefix + walk_path] = path
+                for path in indexed:
+                    if path.startswith(prefix) and path not in candidates:
+                        if (root_path / path).is_file():
+                            candidates[path] = root_path / path
+                        else:
+                            removed.add(path)
+            else:
+                prefix = relative_path + '/'
+                removed.update(path for path in indexed if path == relative_path or path.startswith(prefix))
+
+        # One batched pass applies the exclusion and ignore rules to every candidate
+        changed = {}
+        paths = list(candidates)
+        for path, (included, _) in zip(paths, self.walker.classify(root_path, paths)):
+            if included:
+                changed[path] = candidates[path]
+            elif path in indexed:
+                removed.add(path)
+
+        async def load(candidate) -> Optional[FileChunks]:
+            relative_path, file_path = candidate
+            return await self._load_file_chunks(file_path, relative_path, incremental)
 
-        # Check ignore patterns
-        if self._matches_ignore_pattern(path_str):
-            return False
+        async with aclosing(ordered_map(sorted(changed.items()), load, self.max_workers)) as loaded:
+            async for file_chunks in loaded:
+                if file_chunks is not None:
+                    yield file_chunks
+        for path in sorted(removed):
+            yield FileChunks(relative_path=path, stale=True, removed=True)
 
-        # Check if it's a supported language
-        ext = file_path.suffix.lower()[1:]
-        return ext in self.LANGUAGE_EXTENSIONS
+    async def _load_file_chunks(self,
+                                file_path: Path,
+                                relative_path: str,
+                                incremental: bool) -> Optional[FileChunks]:
+        """Load and chunk one file, or None if it is unchanged or unreadable
+
+        Hashing, sniffing and chunking all block, so they run off the event loop.
+        """
+        try:
+            record = None
+            if incremental:
+                record = await asyncio.to_thread(self.manifest.check, relative_path, file_path)
+                if record is None:
+                    METRICS.inc("index.files_unchanged")
+                    return None
+            stale = incremental and self.manifest.get(relative_path) is not None
+
+            if self.sniffer is not None:
+                reason = await asyncio.to_thread(self.sniffer.sniff, file_path, record.size if record else None)
+                if reason:
+                    # Recorded with no chunks, so the file is not sniffed again until it changes
+                    METRICS.inc(f"index.skipped_{reason}")
+                    return FileChunks(relative_path=relative_path, record=record, stale=stale, skipped=reason)
+
+            # Load and chunk the code file
+            language = self._get_language(file_path)
+            file_docs, timings = await self._load_file(file_path, language)
+            for stage, seconds in timings.items():
+                METRICS.observe(f"index.{stage}", seconds)
+
+            # File-level fields are computed once and shared by the file's chunks;
+            # only files that have chunks in the table are given an id
+            documents = []
+            if file_docs:
+                file_info = FileInfo.create(self.file_ids.get(relative_path), relative_path, language)
+                documents = [Chunk.from_document(doc, file_info, index) for index, doc in enumerate(file_docs)]
+
+        except Exception as e:
+            # The previous record is kept so the file is retried on the next run
+            print(f"Error processing file {file_path}: {str(e)}")
+            METRICS.inc("index.files_failed")
+            return None
+
+        METRICS.inc("index.chunks", len(documents))
+
+        return FileChunks(
+            relative_path=relative_path,
+            documents=documents,
+            record=record,
+            stale=stale
+        )
+
+    async def _load_file(self, file_path: Path,
+                         language: Optional[str]) -> Tuple[List[Document], Dict[str, float]]:
+        """Load and chunk a single file according to the configured load mode
+
+        Returns the documents and the seconds spent loading and chunking.
+        """
+        if self._load_executor is None:
+            return await self.file_loader.load(file_path, language)
+        return await load_in_executor(self._load_executor, file_path, language)
 
     async def process_codebase(self,
                                root_path: Union[str, Path],
-                               recursive: bool = True) -> List[CodeDocument]:
-        """Process and index all code files in the given directory"""
-        root_path = Path(root_path)
-        if not root_path.exists():
-            raise FileNotFoundError(f"Directory not found: {root_path}")
+                               recursive: bool = True) -> List[Chunk]:
+        """Process all new or changed code files in the given directory
 
+        The detected changes are applied to the vector store and manifest by
+        the next `index_code` call. Prefer `index_codebase` for large trees,
+        which streams chunks into the vector store instead of collecting them.
+        """
         documents = []
-        pattern = "**/*" if recursive else "*"
+        self._pending_files = {}
+        self._removed_files = []
 
-        for file_path in root_path.glob(pattern):
-            if file_path.is_file() and self._should_process_file(file_path):
-                try:
-                    relative_path = str(file_path.relative_to(root_path))
-                    language = self._get_language(file_path)
+        async for file_chunks in self._iter_file_chunks(root_path, recursive):
+            if file_chunks.removed:
+                self._removed_files.append(file_chunks.relative_path)
+                continue
+            if file_chunks.record is not None:
+                self._pending_files[file_chunks.relative_path] = file_chunks.record
+            documents.extend(file_chunks.documents)
 
-                    # Load and chunk the code file
-                    file_docs = await self.text_loader.load(file_path)
+        return documents
 
-                    # Create CodeDocuments with appropriate metadata
-                    for doc in file_docs:
-                        code_doc = CodeDocument.from_document(
-                            doc=doc,
-                            file_path=relative_path,
-                            language=language
-                        )
-                        documents.append(code_doc)
+    async def index_code(self, documents: List[Chunk]):
+        """Index the processed code documents
 
-                except Exception as e:
-                    print(f"Error processing file {file_path}: {str(e)}")
+        Chunks previously stored for changed or removed files are deleted before
+        the new ones are written, and the manifest is persisted afterwards.
+        """
+        stale_paths = list(self._pending_files) + self._removed_files
+        stale_paths = [path for path in stale_paths if self.manifest and self.manifest.get(path)]
+        if stale_paths and self.code_table:
+            await self.code_table.delete_files(self._file_ids_of(stale_paths))
+        self.lexical_index.remove_files(stale_paths)
+        if self.query_cache is not None:
+            self.query_cache.invalidate_files(stale_paths)
 
-        return documents
+        record_batches = []
+        for start in range(0, len(documents), self.batch_size):
+            batch = documents[start:start + self.batch_size]
+            embeddings = await self.embedding_scheduler.embed_matrix(batch)
+            record_batches.append(ChunkBatch.from_chunks(batch, self.store_content).to_arrow(embeddings))
+            self.lexical_index.add_documents(batch)
+        await self.code_table.append(record_batches)
+
+        self._commit_manifest(documents)
+        await self._maintain_indices()
+
+    async def _embed_batches(self, batches: AsyncIterator[DocumentBatch]) -> AsyncIterator[DocumentBatch]:
+        """Pipeline stage attaching embeddings to each document batch
+
+        Several batches are embedded concurrently; the scheduler enforces the
+        global in-flight limit and batches are still released in order.
+        """
+        async def embed(batch: DocumentBatch) -> DocumentBatch:
+            if batch.documents:
+                with METRICS.span("index.embed"):
+                    batch.embeddings = await self.embedding_scheduler.embed_matrix(batch.documents)
+            return batch
+
+        async with aclosing(ordered_map(batches, embed, self.embedding_scheduler.max_in_flight)) as embedded:
+            async for batch in embedded:
+                yield batch
+
+    async def _store_batch(self, batch: DocumentBatch) -> Optional[Counter]:
+        """Buffer one embedded batch for the table, flushing once enough rows are pending
+
+        Returns the progress counts committed by the flush, if there was one.
+        """
+        self._write_stale.extend(file_chunks.relative_path for file_chunks in batch.started if file_chunks.stale)
+
+        if batch.documents:
+            chunk_batch = ChunkBatch.from_chunks(batch.documents, self.store_content)
+            self._write_batches.append(chunk_batch.to_arrow(batch.embeddings))
+            self._write_rows += len(batch.documents)
+            self._write_chunks.extend(batch.documents)
+
+        for file_chunks in batch.completed:
+            if file_chunks.record is not None and not file_chunks.removed:
+                file_chunks.record.chunk_ids = [str(doc.doc_id) for doc in file_chunks.documents]
+            file_chunks.documents = []
+        self._write_files.extend(batch.completed)
+
+        counts = self._write_progress
+        counts["batches"] += 1
+        counts["documents"] += len(batch.documents)
+        for completed in batch.completed:
+            if completed.skipped:
+                counts["skipped_files"] += 1
+                counts[f"skipped_{completed.skipped}"] += 1
+            else:
+                counts["removed_files" if completed.removed else "files"] += 1
+
+        if self._write_rows >= self.store_batch_rows:
+            return await self._flush_writes()
+        return None
+
+    def _reset_writes(self):
+        self._write_batches, self._write_rows = [], 0
+        self._write_chunks, self._write_stale, self._write_files = [], [], []
+        self._write_progress = Counter()
+
+    async def _flush_writes(self):
+        """Replace the rows of the buffered files in one write, then record them
+
+        The old rows of changed files are deleted in the same flush that appends
+        their replacements, so a file is never left without rows while its new
+        chunks wait in the buffer. The lexical index, query cache and manifest
+        are only updated once the write went through, so files whose rows never
+        made it to the table are picked up again by the next run. Returns the
+        progress counts of the batches written.
+        """
+        batches, chunks, stale_paths, files, counts = self._write_batches, self._write_chunks, \
+            self._write_stale, self._write_files, self._write_progress
+        self._reset_writes()
+        if stale_paths and self.code_table:
+            with METRICS.span("index.delete"):
+                await self.code_table.delete_files(self._file_ids_of(stale_paths))
+        if batches:
+            with METRICS.span("index.store"):
+                await self.code_table.append(batches)
+
+        self.lexical_index.remove_files(stale_paths)
+        self.lexical_index.add_documents(chunks)
+        if self.query_cache is not None:
+            self.query_cache.invalidate_files(stale_paths)
+
+        if self.manifest:
+            for file_chunks in files:
+                if file_chunks.removed:
+                    self.manifest.remove(file_chunks.relative_path)
+                    self.file_ids.remove([file_chunks.relative_path])
+                elif file_chunks.record is not None:
+                    self.manifest.update(file_chunks.relative_path, file_chunks.record)
+        return counts
+
+    async def index_codebase(self,
+                             root_path: Union[str, Path],
+                             recursive: bool = True,
+                             progress_callback: Optional[Callable[[Dict[str, int]], Any]] = None
+                             ) -> Dict[str, int]:
+        """Stream the codebase through walk -> load/chunk -> embed -> store
+
+        Stages are connected by bounded queues so memory stays flat regardless
+        of repository size, and chunks are searchable as soon as their
+        buffered write (`store_batch_rows`) is flushed. `progress_callback`
+        receives running counts after each write.
+        """
+        async with self._index_lock:
+            with METRICS.span("index.run"):
+                return await self._index_stream(self._iter_file_chunks(root_path, recursive),
+                                                self.batch_size, progress_callback)
 
-    async def index_code(self, documents: List[CodeDocument]):
-        """Index the processed code documents"""
-        if not documents:
+    async def index_changes(self,
+                            root_path: Union[str, Path],
+                            relative_paths: List[str],
+                            progress_callback: Optional[Callable[[Dict[str, int]], Any]] = None
+                            ) -> Dict[str, int]:
+        """Apply added, modified and deleted files under an indexed root
+
+        Used by the file watcher: only the given paths (relative to root) are
+        reloaded, in batches of `watch_batch_size` chunks, and deleted paths
+        are dropped. Queries keep being served while the delta is applied.
+        """
+        root_path = Path(root_path)
+        if self.incremental and self.manifest is not None and \
+                self.manifest.root != str(root_path.resolve()):
+            # Changes to a root that has not been indexed here are not tracked
+            return {"batches": 0, "files": 0, "removed_files": 0, "documents": 0, "skipped_files": 0}
+
+        async with self._index_lock:
+            with METRICS.span("index.changes"):
+                return await self._index_stream(self._iter_changed_chunks(root_path, relative_paths),
+                                                self.config.get('watch_batch_size', 16), progress_callback)
+
+    async def _index_stream(self,
+                            file_chunks: AsyncIterator[FileChunks],
+                            batch_size: int,
+                            progress_callback: Optional[Callable[[Dict[str, int]], Any]] = None
+                            ) -> Dict[str, int]:
+        progress = {"batches": 0, "files": 0, "removed_files": 0, "documents": 0, "skipped_files": 0}
+        progress.update({f"skipped_{reason}": 0 for reason in SKIP_REASONS})
+
+        # Rows left over from a failed run were never recorded in the manifest
+        self._reset_writes()
+
+        def report(counts: Optional[Counter]):
+            # Progress only counts batches whose rows were written
+            if not counts:
+                return
+            for key, value in counts.items():
+                progress[key] += value
+            METRICS.inc("index.batches", counts["batches"])
+            if progress_callback:
+                progress_callback(dict(progress))
+
+        # Every stage is closed on the way out, so a failed write also stops the
+        # producer tasks and in-flight loads and embeddings instead of leaking them
+        try:
+            async with aclosing(file_chunks), \
+                    aclosing(buffered(file_chunks, self.queue_size)) as files, \
+                    aclosing(batch_file_chunks(files, batch_size)) as batches, \
+                    aclosing(self._embed_batches(batches)) as embeddings, \
+                    aclosing(buffered(embeddings, self.queue_size)) as embedded:
+                async for batch in embedded:
+                    report(await self._store_batch(batch))
+            report(await self._flush_writes())
+        finally:
+            self._save_state()
+
+        if progress["batches"]:
+            with METRICS.span("index.maintain"):
+                await self._maintain_indices()
+        METRICS.inc("index.files_indexed", progress["files"])
+        METRICS.inc("index.files_removed", progress["removed_files"])
+        return progress
+
+    def _file_ids_of(self, relative_paths: List[str]) -> List[int]:
+        return [file_id for file_id in map(self.file_ids.lookup, relative_paths) if file_id is not None]
+
+    async def _maintain_indices(self):
+        """Keep the table and its scalar and ANN indexes in step after indexing"""
+        await self.code_table.ensure_scalar_indices()
+        status = await self.code_table.maintain_vector_index(self.config.get("vector_index"))
+        if status in ("created", "rebuilt"):
+            print(f"Vector index {status}")
+        if await self.code_table.optimize(self.config.get("table_maintenance"), force=status == "unindexed"):
+            print(f"Table {self.code_table.table_name} optimized")
+
+    def _save_state(self):
+        """Persist the manifest, lexical index and file ids if they changed"""
+        if self.manifest and self.manifest.dirty:
+            self.manifest.save()
+        if self.lexical_index is not None and self.lexical_index.dirty:
+            self.lexical_index.save()
+        if self.file_ids is not None and self.file_ids.dirty:
+            self.file_ids.save()
+
+    def _commit_manifest(self, documents: List[Chunk]):
+        """Record indexed files and their chunk ids in the manifest"""
+        if not self.manifest:
             return
 
-        embeddings = await self.embedder.embed_documents(documents)
-        await self.vector_store.store_embeddings(documents=documents, embeddings=embeddings)
+        for path in self._removed_files:
+            self.manifest.remove(path)
+        self.file_ids.remove(self._removed_files)
 
-    async def analyze_code(self,
-                           question: str,
-                           filter_criteria: Optional[Dict[str, Any]] = None,
-                           top_k: int = 5) -> QueryResult:
-        """Search and analyze code with specific prompting for code understanding"""
+        for doc in documents:
+            record = self._pending_files.get(doc.file.file_path)
+            if record is not None:
+                record.chunk_ids.append(str(doc.doc_id))
+        for path, record in self._pending_files.items():
+            self.manifest.update(path, record)
+
+        self._save_state()
+        self._pending_files = {}
+        self._removed_files = []
 
-        # Create code-specific prompt
-        enhanced_question = f"""
+    @staticmethod
+    def _enhance_question(question: str) -> str:
+        """Create code-specific prompt used to embed the question"""
+        return f"""
         Analyze this code-related question, focusing on:
         - Code structure and patterns
         - Implementation details
@@ -223,26 +713,273 @@ class CodeAnalysisRAG:
         Question: {question}
         """
 
-        # Get embeddings and search
-        query_embedding = await self.embedder.embed_query(enhanced_question)
-        results = await self.vector_store.search(
-            query_embedding,
-            limit=top_k
-        )
+    async def _vector_search(self,
+                             question: str,
+                             where: Optional[str],
+                             limit: int,
+                             nprobes: Optional[int] = None,
+                             refine_factor: Optional[int] = None,
+                             query_vector: Optional[Sequence[float]] = None) -> List[CodeDocument]:
+        """Embedding search, pushing filters and ANN knobs down into LanceDB"""
+        if query_vector is None:
+            query_vector = await self._embed_question(question)
+        index_config = self.config.get("vector_index", {})
+        with METRICS.span("query.vector_search"):
+            rows = await self.code_table.search(
+                query_vector,
+                limit=limit,
+                where=where,
+                nprobes=nprobes or index_config.get("nprobes"),
+                refine_factor=refine_factor or index_config.get("refine_factor")
+            )
+        return [CodeDocument.from_row(row) for row in rows]
+
+    async def _rerank_search(self,
+                             question: str,
+                             where: Optional[str],
+                             limit: int,
+                             nprobes: Optional[int] = None,
+                             refine_factor: Optional[int] = None,
+                             query_vector: Optional[Sequence[float]] = None) -> List[CodeDocument]:
+        """Overfetch vector candidates and rerank them locally down to `limit`"""
+        if query_vector is None:
+            query_vector = await self._embed_question(question)
+        index_config = self.config.get("vector_index", {})
+        with METRICS.span("query.vector_search"):
+            table = await self.code_table.search_arrow(
+                query_vector,
+                limit=max(limit, self.reranker.candidates),
+                where=where,
+                nprobes=nprobes or index_config.get("nprobes"),
+                refine_factor=refine_factor or index_config.get("refine_factor"),
+                with_vectors=True
+            )
+        if table is None or not table.num_rows:
+            return []
 
-        for doc in results:
-            print(f"File: {doc.metadata}")
-            print("\n")
-        # Generate code-focused response
-        context = "\n\n".join([
-            f"File: {doc.metadata['url']}\n"
-            f"Content:\n{doc.content}"
-            for doc in results
+        columns = [name for name in table.column_names if name != CodeTable.VECTOR_COLUMN]
+        documents = [CodeDocument.from_row(row) for row in table.select(columns).to_pylist()]
+        # Lexical overlap is scored on the text of every candidate
+        await self._rehydrate(documents)
+        with METRICS.span("query.rerank"):
+            ranked = self.reranker.rerank(question, documents, vector_matrix(table), query_vector, limit)
+        for index, score in ranked:
+            documents[index].metadata["rerank_score"] = score
+        return [documents[index] for index, _ in ranked]
+
+    async def _embed_question(self, question: str) -> Sequence[float]:
+        with METRICS.span("query.embed"):
+            query_embedding = await self.embedding_scheduler.embed_query(self._enhance_question(question))
+        return getattr(query_embedding, "vector", query_embedding)
+
+    def _embeds_query(self, question: str, retrieval: Optional[str]) -> bool:
+        """Whether retrieval needs the question embedding; symbol lookups and lexical search do not"""
+        retrieval = retrieval or self.config.get("retrieval", "hybrid")
+        return retrieval != "lexical" and not (retrieval == "hybrid" and is_symbol_query(question))
+
+    async def _lexical_search(self, question: str, where: Optional[str], limit: int) -> List[CodeDocument]:
+        """BM25 identifier search, hydrating the hits from the table"""
+        # Overfetch when filtering, as some hits will not match the predicate
+        with METRICS.span("query.lexical_search"):
+            hits = self.lexical_index.search(question, limit=limit * 4 if where else limit)
+        with METRICS.span("query.fetch"):
+            rows = await self.code_table.fetch([doc_id for doc_id, _ in hits], where)
+        return [CodeDocument.from_row(row) for row in rows[:limit]]
+
+    async def retrieve(self,
+                       question: str,
+                       filter_criteria: Optional[Dict[str, Any]] = None,
+                       top_k: int = 5,
+                       retrieval: Optional[str] = None,
+                       nprobes: Optional[int] = None,
+                       refine_factor: Optional[int] = None,
+                       query_vector: Optional[Sequence[float]] = None) -> List[CodeDocument]:
+        """Find the chunks most relevant to a question
+
+        `retrieval` is "vector", "lexical", "hybrid" (the default), which
+        fuses both rankings with reciprocal rank fusion, or "rerank", which
+        overfetches `rerank.candidates` vector hits and reranks them locally.
+        In hybrid mode, bare identifier questions are answered from the
+        lexical index alone, without embedding the query. A `query_vector`
+        already computed for the question is used instead of embedding it again.
+        """
+        with METRICS.span("query.retrieve"):
+            results = await self._retrieve(question, filter_criteria, top_k, retrieval, nprobes, refine_factor,
+                                           query_vector)
+            await self._rehydrate(results)
+            return results
+
+    async def _rehydrate(self, documents: List[CodeDocument]):
+        """Read the text of chunks stored without it back from the source files
+
+        Chunks of files modified since they were indexed are flagged with
+        `source_changed`, as their byte ranges may no longer line up.
+        """
+        by_file: Dict[str, List[CodeDocument]] = {}
+        for doc in documents:
+            if not doc.content and (doc.metadata.get("end_byte") or 0) > (doc.metadata.get("start_byte") or 0):
+                by_file.setdefault(doc.metadata["file_path"], []).append(doc)
+        if not by_file or not self.manifest or not self.manifest.root:
+            return
+
+        reader = SourceReader(self.manifest.root)
+
+        def read() -> Dict[str, List[str]]:
+            texts = {}
+            for path, docs in by_file.items():
+                try:
+                    stat = os.stat(reader.root / path)
+                    texts[path] = reader.read(path, [(doc.metadata["start_byte"], doc.metadata["end_byte"])
+                                                     for doc in docs])
+                except OSError as e:
+                    print(f"Could not read source of {path}: {str(e)}")
+                    continue
+                record = self.manifest.get(path)
+                if record is None or (record.mtime_ns, record.size) != (stat.st_mtime_ns, stat.st_size):
+                    for doc in docs:
+                        doc.metadata["source_changed"] = True
+            return texts
+
+        with METRICS.span("query.rehydrate"):
+            texts = await asyncio.to_thread(read)
+        for path, file_texts in texts.items():
+            for doc, text in zip(by_file[path], file_texts):
+                doc.content = text
+
+    async def _retrieve(self,
+                        question: str,
+                        filter_criteria: Optional[Dict[str, Any]],
+                        top_k: int,
+                        retrieval: Optional[str],
+                        nprobes: Optional[int],
+                        refine_factor: Optional[int],
+                        query_vector: Optional[Sequence[float]] = None) -> List[CodeDocument]:
+        # Filters are validated before paying for the query embedding
+        where = build_filter(filter_criteria)
+        retrieval = retrieval or self.config.get("retrieval", "hybrid")
+        if retrieval not in ("vector", "lexical", "hybrid", "rerank"):
+            raise ValueError(f"Unknown retrieval mode: {retrieval}")
+
+        if retrieval == "hybrid" and is_symbol_query(question):
+            lexical_results = await self._lexical_search(question, where, top_k)
+            if lexical_results:
+                return lexical_results
+
+        if retrieval == "lexical":
+            return await self._lexical_search(question, where, top_k)
+        if retrieval == "rerank":
+            return await self._rerank_search(question, where, top_k, nprobes, refine_factor, query_vector)
+        if retrieval == "vector" or not len(self.lexical_index):
+            return await self._vector_search(question, where, top_k, nprobes, refine_factor, query_vector)
+
+        # Each ranking contributes a few extra candidates to the fusion
+        vector_results, lexical_results = await asyncio.gather(
+            self._vector_search(question, where, top_k * 2, nprobes, refine_factor, query_vector),
+            self._lexical_search(question, where, top_k * 2)
+        )
+        documents = {doc.doc_id: doc for doc in lexical_results + vector_results}
+        ranking = reciprocal_rank_fusion([
+            [doc.doc_id for doc in vector_results],
+            [doc.doc_id for doc in lexical_results]
         ])
+        return [documents[doc_id] for doc_id in ranking[:top_k]]
 
-        print(context)
+    async def analyze_code(self,
+                           question: str,
+                           filter_criteria: Optional[Dict[str, Any]] = None,
+                           top_k: int = 5,
+                           nprobes: Optional[int] = None,
+                           refine_factor: Optional[int] = None,
+                           retrieval: Optional[str] = None) -> QueryResult:
+        """Search and analyze code with specific prompting for code understanding
+
+        `nprobes` and `refine_factor` tune the ANN search (more probes and
+        refinement improve recall at the cost of latency) and default to the
+        `vector_index` config; `retrieval` selects the retrieval mode.
+        Near-identical repeated questions are answered from the query cache.
+        """
+        with METRICS.span("query.analyze"):
+            return await self._analyze_code(question, filter_criteria, top_k, nprobes, refine_factor, retrieval)
+
+    async def _analyze_code(self,
+                            question: str,
+                            filter_criteria: Optional[Dict[str, Any]],
+                            top_k: int,
+                            nprobes: Optional[int],
+                            refine_factor: Optional[int],
+                            retrieval: Optional[str]) -> QueryResult:
+        cache_vector = cache_key = None
+        # The cache is keyed by the question embedding, so it is only consulted
+        # when retrieval embeds the question anyway
+        if self.query_cache is not None and self._embeds_query(question, retrieval):
+            cache_vector = await self._embed_question(question)
+            cache_key = json.dumps({
+                "filter_criteria": filter_criteria,
+                "top_k": top_k,
+                "nprobes": nprobes,
+                "refine_factor": refine_factor,
+                "retrieval": retrieval,
+                "index_version": self.index_version
+            }, sort_keys=True, default=str)
+            if (hit := self.query_cache.get(cache_vector, cache_key)) is not None:
+                METRICS.inc("query.cache_hits")
+                cached, similarity = hit
+                return QueryResult(
+                    response=cached.response,
+                    source_documents=cached.source_documents,
+                    metadata={**cached.metadata, "query": question, "cache_hit": True,
+                              "cache_similarity": similarity},
+                    created_at=datetime.utcnow()
+                )
+
+            METRICS.inc("query.cache_misses")
+
+        results = await self.retrieve(question, filter_criteria, top_k, retrieval, nprobes, refine_factor,
+                                      query_vector=cache_vector)
+        prompt = self._build_prompt(question, results)
+        with METRICS.span("query.generate"):
+            response = await self.llm.generate(**prompt)
+
+        result = QueryResult(
+            response=response,
+            source_documents=results,
+            metadata={
+                "query": question,
+                "filter_criteria": filter_criteria,
+                "total_results": len(results),
+                # "languages": list(set(doc.metadata["language"] for doc in results))
+            },
+            created_at=datetime.utcnow()
+        )
+        if cache_key is not None:
+            self.query_cache.put(cache_vector, cache_key, result,
+                                 files=(doc.metadata.get("file_path") for doc in results))
+        return result
+
+    @property
+    def index_version(self) -> str:
+        """Identifies the indexed codebase and chunking; changes invalidate cached answers
 
-        response = await self.llm.generate(
+        Re-indexed files invalidate the answers drawn from them individually, so
+        a file saved in a watched project does not empty the whole cache.
+        """
+        if self.manifest is None:
+            return ""
+        return f"{self.manifest.root}|{self.manifest.settings}"
+
+    def _build_prompt(self, question: str, results: List[CodeDocument]) -> Dict[str, str]:
+        """Build the code-focused generation prompt from the retrieved chunks"""
+        # Merge overlapping chunks, drop duplicates and fit the model's budget
+        blocks = self.context_assembler.assemble(results)
+        context = self.context_assembler.render(blocks)
+
+        # Totals over all prompts; divided by the prompt count they give the mean context size
+        METRICS.inc("query.prompts")
+        METRICS.inc("query.context_chunks", len(results))
+        METRICS.inc("query.context_blocks", len(blocks))
+        METRICS.inc("query.context_tokens", self.context_assembler.estimate_tokens(context))
+
+        return dict(
             prompt=f"""
             Question: {question}
 
@@ -263,24 +1000,52 @@ class CodeAnalysisRAG:
             """
         )
 
-        return QueryResult(
-            response=response,
-            source_documents=results,
-            metadata={
-                "query": question,
-                "filter_criteria": filter_criteria,
-                "total_results": len(results),
-                # "languages": list(set(doc.metadata["language"] for doc in results))
-            },
-            created_at=datetime.utcnow()
-        )
+    async def generate_stream(self, question: str, results: List[CodeDocument]) -> AsyncIterator[str]:
+        """Yield the analysis of already retrieved chunks as it is generated
+
+        Uses the LLM's `streaming_generate` when it provides one and falls
+        back to yielding the full completion as a single piece.
+        """
+        prompt = self._build_prompt(question, results)
+        # A span cannot enclose an async generator's yields, so this is timed by hand
+        started = time.perf_counter()
+        first_token = True
+        stream = getattr(self.llm, "streaming_generate", None)
+        if callable(stream):
+            async for token in stream(**prompt):
+                if token:
+                    if first_token:
+                        METRICS.observe("query.first_token", time.perf_counter() - started)
+                        first_token = False
+                    yield token
+            METRICS.observe("query.generate_stream", time.perf_counter() - started)
+            return
+
+        response = await self.llm.generate(**prompt)
+        METRICS.observe("query.first_token", time.perf_counter() - started)
+        METRICS.observe("query.generate_stream", time.perf_counter() - started)
+        yield response
+
+    async def analyze_code_stream(self,
+                                  question: str,
+                                  filter_criteria: Optional[Dict[str, Any]] = None,
+                                  top_k: int = 5,
+                                  retrieval: Optional[str] = None) -> AsyncIterator[str]:
+        """Streaming variant of `analyze_code` yielding response tokens as they arrive"""
+        results = await self.retrieve(question, filter_criteria, top_k, retrieval)
+        async for token in self.generate_stream(question, results):
+            yield token
 
     async def close(self):
         """Clean up resources"""
-        if self.llm:
-            await self.llm.__aexit__(None, None, None)
-        if self.embedder:
-            await self.embedder.__aexit__(None, None, None)
+        if self.clients and self._owns_clients:
+            await self.clients.close()
+        self.clients = None
+        if self._load_executor:
+            self._load_executor.shutdown(wait=False, cancel_futures=True)
+            self._load_executor = None
+        if self.lexical_index is not None:
+            self.lexical_index.close()
 
 
 async def main():
@@ -0,0 +1,287 @@
+import ast
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+BRACE_LANGUAGES = {
+    'javascript', 'typescript', 'java', 'c++', 'c', 'go', 'rust', 'php',
+    'csharp', 'scala', 'swift', 'kotlin', 'css', 'r'
+}
+
+# First identifier after a definition keyword, for brace-language block names
+_SYMBOL_PATTERN = re.compile(
+    r'\b(?:class|interface|struct|enum|trait|impl|object|fn|func|function|def|fun|'
+    r'module|namespace|type)\s+([A-Za-z_$][\w$]*)'
+)
+# `name(...) {`, `name = (...) =>` and similar method/arrow definitions
+_CALLABLE_PATTERN = re.compile(r'([A-Za-z_$][\w$]*)\s*(?:=\s*(?:async\s*)?)?\([^;]*$')
+_HEADING_PATTERN = re.compile(r'^#{1,6}\s+(.*)')
+# Line ends as Python's tokenizer sees them; str.splitlines also breaks on
+# form feeds, \x1c-\x1e, \x85, \u2028 and \u2029, which would shift line numbers
+_LINE_END_PATTERN = re.compile(r'(?<=\n)|(?<=\r)(?!\n)')
+
+
+def split_lines(text: str) -> List[str]:
+    """Split text after each \\n, \\r\\n or lone \\r, keeping the line ends"""
+    lines = _LINE_END_PATTERN.split(text)
+    if lines[-1] == "":
+        lines.pop()
+    return lines
+
+
+@dataclass
+class CodeChunk:
+    """A contiguous range of source lines, aligned to syntactic boundaries where possible"""
+    content: str
+    start_line: int  # 1-based, inclusive
+    end_line: int  # 1-based, inclusive
+    symbol: Optional[str] = None
+    kind: str = "block"
+
+
+@dataclass
+class _Block:
+    start: int  # 0-based line index, inclusive
+    end: int  # 0-based line index, exclusive
+    symbol: Optional[str] = None
+    kind: str = "block"
+
+
+class CodeChunker:
+    """Language-aware chunker emitting chunks at function/class boundaries
+
+    Python is split with `ast`; brace languages use a brace-depth scan and
+    everything else falls back to blank-line separated, unindented blocks.
+    Small neighbouring blocks are packed together up to `max_chunk_chars`,
+    oversized blocks are split on line boundaries, and no text is duplicated
+    between chunks.
+    """
+
+    def __init__(self, max_chunk_chars: int = 1500, min_chunk_chars: int = 200):
+        self.max_chunk_chars = max_chunk_chars
+        self.min_chunk_chars = min_chunk_chars
+
+    def chunk(self, text: str, language: Optional[str]) -> List[CodeChunk]:
+        lines = split_lines(text)
+        if not lines:
+            return []
+
+        blocks = None
+        if language == 'python':
+            blocks = self._python_blocks(text, lines)
+        elif language in BRACE_LANGUAGES:
+            blocks = self._brace_blocks(lines)
+        elif language == 'markdown':
+            blocks = self._heading_blocks(lines)
+        if blocks is None:
+            blocks = self._indent_blocks(lines)
+
+        return self._pack(self._fill_gaps(blocks, len(lines)), lines)
+
+    # Block detection
+
+    def _python_blocks(self, text: str, lines: List[str]) -> Optional[List[_Block]]:
+        try:
+            tree = ast.parse(text)
+        except (SyntaxError, ValueError):
+            return None
+
+        blocks = []
+        for node in tree.body:
+            blocks.extend(self._python_node_blocks(node, lines, prefix=""))
+        return blocks
+
+    def _python_node_blocks(self, node: ast.AST, lines: List[str], prefix: str) -> List[_Block]:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            return []
+
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list]) - 1
+        end = node.end_lineno
+        name = f"{prefix}{node.name}"
+        kind = "class" if isinstance(node, ast.ClassDef) else ("method" if prefix else "function")
+        if not isinstance(node, ast.ClassDef) or self._size(lines, start, end) <= self.max_chunk_chars:
+            return [_Block(start, end, name, kind)]
+
+        # Large classes are split into their methods; the header and class-level
+        # statements between methods remain attributed to the class
+        children = []
+        for child in node.body:
+            children.extend(self._python_node_blocks(child, lines, prefix=f"{name}."))
+        blocks, position = [], start
+        for child in children + [_Block(end, end)]:
+            if child.start > position:
+                # Blank lines between methods carry no symbol
+                has_code = any(line.strip() for line in lines[position:child.start])
+                blocks.append(_Block(position, child.start, name if has_code else None, "class"))
+            if child.end > child.start:
+                blocks.append(child)
+            position = child.end
+        return blocks
+
+    def _brace_blocks(self, lines: List[str]) -> List[_Block]:
+        blocks = []
+        depth = 0
+        block_start = None
+        in_block_comment = False
+        for index, line in enumerate(lines):
+            code, in_block_comment = self._strip_comments_and_strings(line, in_block_comment)
+            if depth == 0 and block_start is None and '{' in code:
+                block_start = self._block_header_start(lines, index)
+            depth += code.count('{') - code.count('}')
+            if depth <= 0:
+                depth = 0
+                if block_start is not None:
+                    header = ''.join(lines[block_start:index + 1])
+                    blocks.append(_Block(block_start, index + 1, *self._brace_symbol(header)))
+                    block_start = None
+        if block_start is not None:
+            blocks.append(_Block(block_start, len(lines), *self._brace_symbol(''.join(lines[block_start:]))))
+        return blocks
+
+    @staticmethod
+    def _block_header_start(lines: List[str], index: int) -> int:
+        # Pull leading comments, annotations and multi-line signatures into the block
+        start = index
+        while start > 0:
+            previous = lines[start - 1].strip()
+            if not previous or previous.endswith((';', '}')):
+                break
+            start -= 1
+        return start
+
+    @staticmethod
+    def _strip_comments_and_strings(line: str, in_block_comment: bool):
+        out = []
+        i, n = 0, len(line)
+        quote = None
+        while i < n:
+            c = line[i]
+            if in_block_comment:
+                if line.startswith('*/', i):
+                    in_block_comment = False
+                    i += 2
+                    continue
+                i += 1
+            elif quote:
+                if c == '\\':
+                    i += 2
+                    continue
+                if c == quote:
+                    quote = None
+                i += 1
+            elif line.startswith('//', i):
+                break
+            elif line.startswith('/*', i):
+                in_block_comment = True
+                i += 2
+            elif c in '"\'`':
+                quote = c
+                i += 1
+            else:
+                out.append(c)
+                i += 1
+        return ''.join(out), in_block_comment
+
+    @staticmethod
+    def _brace_symbol(header: str):
+        signature = header.split('{', 1)[0]
+        if match := _SYMBOL_PATTERN.search(signature):
+            keyword = match.group(0).split()[0]
+            kind = "class" if keyword in ('class', 'interface', 'struct', 'enum', 'trait',
+                                          'impl', 'object', 'module', 'namespace', 'type') else "function"
+            return match.group(1), kind
+        for line in reversed(signature.strip().splitlines()):
+            if match := _CALLABLE_PATTERN.search(line):
+                return match.group(1), "function"
+        return None, "block"
+
+    @staticmethod
+    def _heading_blocks(lines: List[str]) -> List[_Block]:
+        blocks = []
+        for index, line in enumerate(lines):
+            if match := _HEADING_PATTERN.match(line):
+                if blocks:
+                    blocks[-1].end = index
+                blocks.append(_Block(index, len(lines), match.group(1).strip(), "section"))
+        return blocks
+
+    @staticmethod
+    def _indent_blocks(lines: List[str]) -> List[_Block]:
+        # A new block starts at an unindented line following a blank line
+        blocks = []
+        start = 0
+        for index in range(1, len(lines)):
+            line = lines[index]
+            if line.strip() and not line[0].isspace() and not lines[index - 1].strip():
+                blocks.append(_Block(start, index))
+                start = index
+        blocks.append(_Block(start, len(lines)))
+        return blocks
+
+    # Packing
+
+    @staticmethod
+    def _size(lines: List[str], start: int, end: int) -> int:
+        return sum(len(line) for line in lines[start:end])
+
+    @staticmethod
+    def _fill_gaps(blocks: List[_Block], line_count: int) -> List[_Block]:
+        """Cover lines between detected blocks (imports, module code) with plain blocks"""
+        filled, position = [], 0
+        for block in sorted(blocks, key=lambda b: b.start):
+            if block.start < position:
+                continue
+            if block.start > position:
+                filled.append(_Block(position, block.start))
+            filled.append(block)
+            position = block.end
+        if position < line_count:
+            filled.append(_Block(position, line_count))
+        return filled
+
+    def _split_oversized(self, block: _Block, lines: List[str]) -> List[_Block]:
+        parts, start, size = [], block.start, 0
+        for index in range(block.start, block.end):
+            if size and size + len(lines[index]) > self.max_chunk_chars:
+                parts.append(_Block(start, index, block.symbol, block.kind))
+                start, size = index, 0
+            size += len(lines[index])
+        parts.append(_Block(start, block.end, block.symbol, block.kind))
+        return parts
+
+    def _pack(self, blocks: List[_Block], lines: List[str]) -> List[CodeChunk]:
+        chunks = []
+        current: List[_Block] = []
+        current_size = 0
+
+        def flush():
+            nonlocal current, current_size
+            if not current:
+                return
+            start, end = current[0].start, current[-1].end
+            content = ''.join(lines[start:end])
+            if content.strip():
+                named = [b for b in current if b.symbol]
+                chunks.append(CodeChunk(
+                    content=content,
+                    start_line=start + 1,
+                    end_line=end,
+                    symbol=", ".join(dict.fromkeys(b.symbol for b in named)) or None,
+                    kind=named[0].kind if len(named) == 1 else ("mixed" if named else "block")
+                ))
+            current, current_size = [], 0
+
+        for block in blocks:
+            for part in self._split_oversized(block, lines):
+                size = self._size(lines, part.start, part.end)
+                # Keep definitions whole: only merge while the result stays within budget,
+                # and always let small leftovers join their neighbour
+                if current and current_size + size > self.max_chunk_chars and \
+                        current_size >= self.min_chunk_chars:
+                    flush()
+                current.append(part)
+                current_size += size
+                if current_size >= self.max_chunk_chars:
+                    flush()
+        flush()
+        return chunks
@@ -0,0 +1,212 @@
+from array import array
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pyarrow as pa
+
+
+@dataclass(frozen=True)
+class FileInfo:
+    """File-level fields shared by every chunk of a file, computed once per file"""
+    __slots__ = ("file_id", "file_path", "file_name", "extension", "language", "code_type")
+    file_id: int
+    file_path: str
+    file_name: str
+    extension: str
+    language: Optional[str]
+    code_type: str
+
+    @classmethod
+    def create(cls, file_id: int, file_path: str, language: Optional[str],
+               code_type: str = "source") -> 'FileInfo':
+        file_name = file_path.rpartition('/')[2]
+        dot = file_name.rfind('.')
+        return cls(file_id, file_path, file_name, file_name[dot + 1:] if dot > 0 else "", language, code_type)
+
+
+class Chunk:
+    """Compact in-flight chunk: its own fields plus a reference to its file's FileInfo
+
+    Exposes `content`, `doc_id` and a `metadata` view so the embedding and
+    lexical stages can treat it like a Document without per-chunk dicts.
+    """
+
+    __slots__ = ("file", "doc_id", "content", "chunk_index", "start_line", "end_line",
+                 "start_byte", "end_byte", "symbol", "symbol_kind", "created_at")
+
+    def __init__(self, file: FileInfo, doc_id: str, content: str, chunk_index: int = 0,
+                 start_line: int = 0, end_line: int = 0, start_byte: int = 0, end_byte: int = 0,
+                 symbol: str = "", symbol_kind: str = "block", created_at: Optional[datetime] = None):
+        self.file = file
+        self.doc_id = doc_id
+        self.content = content
+        self.chunk_index = chunk_index
+        self.start_line = start_line
+        self.end_line = end_line
+        self.start_byte = start_byte
+        self.end_byte = end_byte
+        self.symbol = symbol
+        self.symbol_kind = symbol_kind
+        self.created_at = created_at
+
+    @classmethod
+    def from_document(cls, doc: Any, file: FileInfo, chunk_index: int) -> 'Chunk':
+        """Wrap a loader Document; line and byte fields are 0 when the chunker does not provide them"""
+        metadata = doc.metadata or {}
+        return cls(
+            file=file,
+            # Loader documents carry UUID ids; the table and indexes use strings
+            doc_id=str(doc.doc_id),
+            content=doc.content,
+            chunk_index=metadata.get("chunk_index", chunk_index),
+            start_line=metadata.get("start_line") or 0,
+            end_line=metadata.get("end_line") or 0,
+            start_byte=metadata.get("start_byte") or 0,
+            end_byte=metadata.get("end_byte") or 0,
+            symbol=metadata.get("symbol") or "",
+            symbol_kind=metadata.get("symbol_kind") or "block",
+            created_at=doc.created_at
+        )
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """The flat column values of this chunk, built on demand"""
+        return {
+            "file_path": self.file.file_path,
+            "url": self.file.file_path,
+            "file_name": self.file.file_name,
+            "extension": self.file.extension,
+            "language": self.file.language,
+            "code_type": self.file.code_type,
+            "index": self.file.file_id,
+            "chunk_index": self.chunk_index,
+            "start_line": self.start_line,
+            "end_line": self.end_line,
+            "start_byte": self.start_byte,
+            "end_byte": self.end_byte,
+            "symbol": self.symbol,
+            "symbol_kind": self.symbol_kind,
+        }
+
+
+def table_schema(dimension: int) -> pa.Schema:
+    """Arrow schema of the code table for embeddings of the given dimension"""
+    return pa.schema([
+        pa.field("id", pa.string()),
+        pa.field("content", pa.string()),
+        pa.field("vector", pa.list_(pa.float32(), dimension)),
+        pa.field("index", pa.int64()),
+        pa.field("file_path", pa.string()),
+        pa.field("file_name", pa.string()),
+        pa.field("extension", pa.string()),
+        pa.field("language", pa.string()),
+        pa.field("code_type", pa.string()),
+        pa.field("chunk_index", pa.int32()),
+        pa.field("start_line", pa.int32()),
+        pa.field("end_line", pa.int32()),
+        pa.field("start_byte", pa.int64()),
+        pa.field("end_byte", pa.int64()),
+        pa.field("symbol", pa.string()),
+        pa.field("symbol_kind", pa.string()),
+        pa.field("created_at", pa.timestamp("us")),
+    ])
+
+
+class ChunkBatch:
+    """Columnar batch of chunks ready for Arrow conversion
+
+    File-level fields are stored once per file and referenced by row; chunk
+    text is kept as one UTF-8 buffer with offsets, which becomes the Arrow
+    string column without copying. Without `store_content`, chunks that know
+    their byte range in the file are stored with empty text, to be read back
+    from the source when needed.
+    """
+
+    def __init__(self, store_content: bool = True):
+        self.store_content = store_content
+        self.files: List[FileInfo] = []
+        self._file_rows: Dict[int, int] = {}
+        self.file_row = array('i')
+        self.doc_ids: List[str] = []
+        self.chunk_index = array('i')
+        self.start_line = array('i')
+        self.end_line = array('i')
+        self.start_byte = array('q')
+        self.end_byte = array('q')
+        self.symbol: List[str] = []
+        self.symbol_kind: List[str] = []
+        self.created_at: List[Optional[datetime]] = []
+        self._text = bytearray()
+        self._offsets = array('i', [0])
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[Chunk], store_content: bool = True) -> 'ChunkBatch':
+        batch = cls(store_content)
+        for chunk in chunks:
+            batch.add(chunk)
+        return batch
+
+    def add(self, chunk: Chunk):
+        row = self._file_rows.get(chunk.file.file_id)
+        if row is None:
+            row = self._file_rows[chunk.file.file_id] = len(self.files)
+            self.files.append(chunk.file)
+        self.file_row.append(row)
+        self.doc_ids.append(chunk.doc_id)
+        self.chunk_index.append(chunk.chunk_index)
+        self.start_line.append(chunk.start_line)
+        self.end_line.append(chunk.end_line)
+        self.start_byte.append(chunk.start_byte)
+        self.end_byte.append(chunk.end_byte)
+        self.symbol.append(chunk.symbol)
+        self.symbol_kind.append(chunk.symbol_kind)
+        self.created_at.append(chunk.created_at)
+        if self.store_content or chunk.end_byte <= chunk.start_byte:
+            self._text += chunk.content.encode('utf-8')
+        self._offsets.append(len(self._text))
+
+    def _text_array(self) -> pa.Array:
+        return pa.Array.from_buffers(pa.string(), len(self),
+                                     [None, pa.py_buffer(self._offsets), pa.py_buffer(self._text)])
+
+    def _file_column(self, rows: pa.Array, field: str, type: pa.DataType) -> pa.Array:
+        # Take from the per-file values instead of repeating them per chunk in Python
+        values = pa.array([getattr(file, field) for file in self.files], type=type)
+        return values.take(rows)
+
+    def to_arrow(self, vectors: np.ndarray) -> pa.RecordBatch:
+        """Build a record batch in `table_schema` layout with one embedding row per chunk
+
+        A C-contiguous float32 matrix (as returned by `embed_matrix`) becomes
+        the vector column without copying; other inputs are converted first.
+        """
+        matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[0] != len(self):
+            raise ValueError(f"Expected {len(self)} embeddings, got an array of shape {matrix.shape}")
+        schema = table_schema(matrix.shape[1])
+        rows = pa.array(np.frombuffer(self.file_row, dtype=np.int32))
+        vector_array = pa.FixedSizeListArray.from_arrays(pa.array(matrix.reshape(-1)), matrix.shape[1])
+        return pa.RecordBatch.from_arrays([
+            pa.array(self.doc_ids, type=pa.string()),
+            self._text_array(),
+            vector_array,
+            self._file_column(rows, "file_id", pa.int64()),
+            self._file_column(rows, "file_path", pa.string()),
+            self._file_column(rows, "file_name", pa.string()),
+            self._file_column(rows, "extension", pa.string()),
+            self._file_column(rows, "language", pa.string()),
+            self._file_column(rows, "code_type", pa.string()),
+            pa.array(np.frombuffer(self.chunk_index, dtype=np.int32)),
+            pa.array(np.frombuffer(self.start_line, dtype=np.int32)),
+            pa.array(np.frombuffer(self.end_line, dtype=np.int32)),
+            pa.array(np.frombuffer(self.start_byte, dtype=np.int64)),
+            pa.array(np.frombuffer(self.end_byte, dtype=np.int64)),
+            pa.array(self.symbol, type=pa.string()),
+            pa.array(self.symbol_kind, type=pa.string()),
+            pa.array(self.created_at, type=pa.timestamp("us")),
+        ], schema=schema)
@@ -0,0 +1,183 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Union
+
+from rag.chunker import split_lines
+
+DEFAULT_CONTEXT_BUDGET = 3000  # tokens
+
+# Overlapping text windows are only joined on a shared run at least this long
+_MIN_TEXT_OVERLAP = 32
+
+
+@dataclass
+class ContextBlock:
+    """A contiguous excerpt of one file assembled from one or more retrieved chunks"""
+    file_path: str
+    content: str
+    rank: int  # best retrieval rank among the merged chunks, 0 is most relevant
+    start_line: Optional[int] = None
+    end_line: Optional[int] = None
+    chunk_index: Optional[int] = None  # of the last merged chunk, for text windows
+    doc_ids: List[str] = field(default_factory=list)
+
+    @property
+    def header(self) -> str:
+        if self.start_line and self.end_line:
+            return f"File: {self.file_path} (lines {self.start_line}-{self.end_line})"
+        return f"File: {self.file_path}"
+
+    def render(self) -> str:
+        return f"{self.header}\nContent:\n{self.content}"
+
+
+def resolve_context_budget(config: Dict[str, Any]) -> int:
+    """Token budget for the configured LLM
+
+    `context_budget` is either a number or a mapping of model name to
+    budget, with an optional "default" entry.
+    """
+    budget: Union[int, Dict[str, int]] = config.get("context_budget", DEFAULT_CONTEXT_BUDGET)
+    if isinstance(budget, dict):
+        model_name = config.get("llm", {}).get("model_name")
+        return budget.get(model_name, budget.get("default", DEFAULT_CONTEXT_BUDGET))
+    return budget
+
+
+def _as_int(value) -> Optional[int]:
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def _text_overlap(left: str, right: str, max_overlap: int) -> int:
+    """Length of the longest suffix of left that is a prefix of right"""
+    for size in range(min(len(left), len(right), max_overlap), _MIN_TEXT_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _line_set(text: str) -> Set[str]:
+    return {line.strip() for line in text.splitlines() if line.strip()}
+
+
+class ContextAssembler:
+    """Packs retrieved chunks into the smallest prompt context for a token budget
+
+    Chunks of the same file that overlap or touch (by line range, or by
+    chunk index and shared text for fixed-size windows) are merged into one
+    block, blocks whose lines mostly repeat a more relevant block are
+    dropped, and the rest are added in relevance order while they fit.
+    """
+
+    def __init__(self,
+                 max_tokens: int = DEFAULT_CONTEXT_BUDGET,
+                 chars_per_token: int = 4,
+                 duplicate_threshold: float = 0.9,
+                 max_overlap_chars: int = 1000):
+        self.max_tokens = max_tokens
+        self.chars_per_token = chars_per_token
+        self.duplicate_threshold = duplicate_threshold
+        self.max_overlap_chars = max_overlap_chars
+
+    def estimate_tokens(self, text: str) -> int:
+        return len(text) // self.chars_per_token + 1
+
+    def assemble(self, results: List[Any]) -> List[ContextBlock]:
+        """Merge, deduplicate and budget results, which are ordered by relevance"""
+        by_file: Dict[str, List[ContextBlock]] = {}
+        for rank, doc in enumerate(results):
+            file_path = doc.metadata.get("file_path") or doc.metadata.get("url") or ""
+            by_file.setdefault(file_path, []).append(ContextBlock(
+                file_path=file_path,
+                content=doc.content,
+                rank=rank,
+                start_line=_as_int(doc.metadata.get("start_line")),
+                end_line=_as_int(doc.metadata.get("end_line")),
+                chunk_index=_as_int(doc.metadata.get("chunk_index")),
+                doc_ids=[doc.doc_id]
+            ))
+
+        blocks = [block for file_blocks in by_file.values() for block in self._merge_file(file_blocks)]
+        blocks.sort(key=lambda block: block.rank)
+        return self._fill_budget(self._drop_duplicates(blocks))
+
+    def _merge_file(self, blocks: List[ContextBlock]) -> List[ContextBlock]:
+        def position(block: ContextBlock):
+            return (block.start_line or 0, block.chunk_index or 0)
+
+        merged: List[ContextBlock] = []
+        for block in sorted(blocks, key=position):
+            if merged and self._merge_into(merged[-1], block):
+                continue
+            merged.append(block)
+        return merged
+
+    def _merge_into(self, current: ContextBlock, block: ContextBlock) -> bool:
+        if current.start_line and current.end_line and block.start_line and block.end_line:
+            if block.start_line > current.end_line + 1:
+                return False
+            # Chunks are line aligned, so skip the lines already in current
+            lines = split_lines(block.content)
+            skip = current.end_line - block.start_line + 1
+            if skip < len(lines):
+                if current.content and not current.content.endswith('\n'):
+                    current.content += '\n'
+                current.content += ''.join(lines[skip:])
+                current.end_line = block.end_line
+        else:
+            overlap = _text_overlap(current.content, block.content, self.max_overlap_chars)
+            adjacent = current.chunk_index is not None and block.chunk_index is not None and \
+                block.chunk_index == current.chunk_index + 1
+            if block.content in current.content:
+                pass
+            elif overlap or adjacent:
+                current.content += block.content[overlap:]
+                current.chunk_index = block.chunk_index
+            else:
+                return False
+
+        current.rank = min(current.rank, block.rank)
+        current.doc_ids.extend(block.doc_ids)
+        return True
+
+    def _drop_duplicates(self, blocks: List[ContextBlock]) -> List[ContextBlock]:
+        kept, kept_lines = [], []
+        for block in blocks:
+            lines = _line_set(block.content)
+            if lines and any(len(lines & other) >= self.duplicate_threshold * len(lines) for other in kept_lines):
+                continue
+            kept.append(block)
+            kept_lines.append(lines)
+        return kept
+
+    def _fill_budget(self, blocks: List[ContextBlock]) -> List[ContextBlock]:
+        packed, used = [], 0
+        for block in blocks:
+            tokens = self.estimate_tokens(block.render())
+            if used + tokens <= self.max_tokens:
+                packed.append(block)
+                used += tokens
+            elif not packed:
+                # Never return an empty context: keep the head of the best block
+                self._truncate(block, self.max_tokens)
+                packed.append(block)
+                used += self.estimate_tokens(block.render())
+        return packed
+
+    def _truncate(self, block: ContextBlock, max_tokens: int):
+        max_chars = max(0, (max_tokens - self.estimate_tokens(block.header + "\nContent:\n")) * self.chars_per_token)
+        lines, size = [], 0
+        for line in split_lines(block.content):
+            if size + len(line) > max_chars:
+                break
+            lines.append(line)
+            size += len(line)
+        block.content = ''.join(lines) if lines else block.content[:max_chars]
+        if block.start_line and lines:
+            block.end_line = block.start_line + len(lines) - 1
+
+    def render(self, blocks: List[ContextBlock]) -> str:
+        return "\n\n".join(block.render() for block in blocks)
@@ -0,0 +1,187 @@
+import asyncio
+import itertools
+import random
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+from ceylon_rag.interfaces.schemas import Document
+
+from rag.embedding_cache import EmbeddingCache
+from rag.metrics import METRICS
+
+
+def embedding_matrix(embeddings: Sequence[Any]) -> np.ndarray:
+    """Stack embedding objects or plain vectors into an (n, dim) float32 array"""
+    if not len(embeddings):
+        return np.empty((0, 0), dtype=np.float32)
+    return np.array([getattr(embedding, "vector", embedding) for embedding in embeddings], dtype=np.float32)
+
+
+class EmbeddingScheduler:
+    """Batching, rate-limited front end for a factory-created embedder
+
+    Documents are split into batches bounded both by count and by an estimated
+    token budget, up to `max_in_flight` batches are sent concurrently (shared
+    across all callers), and each batch is retried with exponential backoff on
+    its own, so a transient failure never re-sends batches that already
+    succeeded. With an `EmbeddingCache`, previously seen texts are served from
+    disk and duplicate texts within a call are embedded only once. Any object
+    with async `embed_documents`/`embed_query` methods can be wrapped, which
+    makes it easy to drive with a local stub embedder.
+    """
+
+    def __init__(self,
+                 embedder: Any,
+                 max_batch_size: int = 32,
+                 max_batch_tokens: int = 8000,
+                 max_in_flight: int = 2,
+                 max_retries: int = 4,
+                 backoff_base: float = 0.5,
+                 backoff_max: float = 30.0,
+                 chars_per_token: float = 4.0,
+                 cache: Optional[EmbeddingCache] = None,
+                 cache_namespace: str = ""):
+        self.embedder = embedder
+        self.cache = cache
+        self.cache_namespace = cache_namespace
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_tokens = max(1, max_batch_tokens)
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.chars_per_token = chars_per_token
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def estimate_tokens(self, text: str) -> int:
+        """Cheap token estimate used for batch sizing"""
+        return int(len(text) / self.chars_per_token) + 1
+
+    def make_batches(self, documents: Sequence[Document]) -> List[List[Document]]:
+        """Split documents into batches respecting the size and token limits
+
+        A single document larger than the token budget still gets a batch of
+        its own; truncating it is left to the embedder backend.
+        """
+        batches = []
+        batch, batch_tokens = [], 0
+        for doc in documents:
+            tokens = self.estimate_tokens(doc.content)
+            if batch and (len(batch) >= self.max_batch_size
+                          or batch_tokens + tokens > self.max_batch_tokens):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(doc)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._semaphore
+
+    async def _embed_batch(self, batch: List[Document]) -> List[Any]:
+        """Embed one batch, retrying with jittered exponential backoff"""
+        attempt = 0
+        while True:
+            async with self._get_semaphore():
+                try:
+                    with METRICS.span("embed.batch"):
+                        embeddings = await self.embedder.embed_documents(batch)
+                    if len(embeddings) != len(batch):
+                        raise RuntimeError(
+                            f"Embedder returned {len(embeddings)} embeddings for {len(batch)} documents"
+                        )
+                    METRICS.inc("embed.batches")
+                    METRICS.inc("embed.texts", len(batch))
+                    METRICS.inc("embed.tokens", sum(self.estimate_tokens(doc.content) for doc in batch))
+                    return embeddings
+                except Exception as e:
+                    if attempt >= self.max_retries:
+                        raise RuntimeError(
+                            f"Embedding batch of {len(batch)} documents failed after "
+                            f"{attempt + 1} attempts: {str(e)}"
+                        ) from e
+                    error = e
+
+            # Back off outside the semaphore so other batches can proceed
+            delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+            delay *= 0.5 + random.random() / 2
+            print(f"Embedding batch failed ({str(error)}), retrying in {delay:.1f}s")
+            METRICS.inc("embed.retries")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _embed_uncached(self, documents: Sequence[Document],
+                              cache_keys: Optional[Sequence[str]] = None) -> List[Any]:
+        """Embed all documents, caching each batch under `cache_keys` as it completes
+
+        Batches that succeeded stay cached when another batch fails for good,
+        so a retried run only pays for the batches that failed.
+        """
+        batches = self.make_batches(documents)
+
+        async def embed(batch: List[Document], start: int) -> List[Any]:
+            embeddings = await self._embed_batch(batch)
+            if cache_keys is not None:
+                keys = cache_keys[start:start + len(batch)]
+                await asyncio.to_thread(self.cache.put_many, dict(zip(keys, embeddings)))
+            return embeddings
+
+        # Batches are consecutive runs of the documents
+        starts = itertools.accumulate((len(batch) for batch in batches), initial=0)
+        results = await asyncio.gather(
+            *(embed(batch, start) for batch, start in zip(batches, starts)),
+            return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+
+        return [embedding for batch_embeddings in results for embedding in batch_embeddings]
+
+    async def embed_documents(self, documents: Sequence[Document]) -> List[Any]:
+        """Embed documents in scheduled batches, preserving input order"""
+        if not documents:
+            return []
+        if self.cache is None:
+            return await self._embed_uncached(documents)
+
+        keys = [EmbeddingCache.make_key(self.cache_namespace, doc.content) for doc in documents]
+        embeddings = await asyncio.to_thread(self.cache.get_many, keys)
+
+        missing = {}
+        for key, doc in zip(keys, documents):
+            if key not in embeddings and key not in missing:
+                missing[key] = doc
+        METRICS.inc("embed.cache_hits", len(documents) - len(missing))
+        METRICS.inc("embed.cache_misses", len(missing))
+        if missing:
+            missing_keys = list(missing)
+            embeddings.update(zip(missing_keys, await self._embed_uncached(list(missing.values()), missing_keys)))
+
+        return [embeddings[key] for key in keys]
+
+    async def embed_matrix(self, documents: Sequence[Document]) -> np.ndarray:
+        """Embed documents into a float32 matrix with one row per document"""
+        return embedding_matrix(await self.embed_documents(documents))
+
+    async def embed_query(self, query: str) -> Any:
+        """Embed a single query, sharing the in-flight limit with document batches"""
+        key = None
+        if self.cache is not None:
+            key = EmbeddingCache.make_key(self.cache_namespace, query, kind="query")
+            if (cached := (await asyncio.to_thread(self.cache.get_many, [key])).get(key)) is not None:
+                METRICS.inc("embed.query_cache_hits")
+                return cached
+
+        async with self._get_semaphore():
+            embedding = await self.embedder.embed_query(query)
+        METRICS.inc("embed.queries")
+
+        if key is not None:
+            await asyncio.to_thread(self.cache.put_many, {key: embedding})
+        return embedding
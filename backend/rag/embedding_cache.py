@@ -0,0 +1,139 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Union
+
+
+class EmbeddingCache:
+    """Content-addressed on-disk embedding cache with LRU eviction
+
+    Entries are keyed by the embedder namespace (backend type and model name)
+    and the hash of the embedded text, so identical chunks are embedded once
+    no matter which project, file or index run they come from. The cache is a
+    single SQLite file; when it grows beyond `max_entries` or `max_bytes` the
+    least recently used entries are evicted. Vectors are stored as raw float32
+    bytes and come back as `array('f')` sequences.
+    """
+
+    VERSION = 2
+
+    def __init__(self,
+                 path: Union[str, Path],
+                 max_entries: int = 1_000_000,
+                 max_bytes: int = 2 * 1024 ** 3):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != self.VERSION:
+            # Version 1 pickled whole embedding objects
+            self._conn.execute("DROP TABLE IF EXISTS embeddings")
+            self._conn.execute(f"PRAGMA user_version = {self.VERSION}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        # Running totals, so writes only scan the table when eviction is due
+        self._count, self._size = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings"
+        ).fetchone()
+
+    @staticmethod
+    def make_key(namespace: str, text: str, kind: str = "document") -> str:
+        """Key for `text` embedded as `kind` ("document" or "query") within a namespace"""
+        digest = hashlib.sha256(text.encode("utf-8", errors="surrogatepass")).hexdigest()
+        return f"{namespace}:{kind}:{digest}"
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, array]:
+        """Return cached embeddings for the keys that are present, refreshing their LRU stamp"""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for key, value in rows:
+                    vector = found[key] = array('f')
+                    vector.frombytes(value)
+
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                       [(now, key) for key in found])
+                self._conn.commit()
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, Any]):
+        """Store embeddings and evict least recently used entries if over budget"""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for key, embedding in items.items():
+            value = array('f', getattr(embedding, "vector", embedding)).tobytes()
+            rows.append((key, value, len(value), now))
+
+        with self._lock:
+            # Replaced entries no longer count towards the totals
+            replaced = self._sizes_of([row[0] for row in rows])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._count += len(rows) - len(replaced)
+            self._size += sum(row[2] for row in rows) - sum(replaced.values())
+            if self._count > self.max_entries or self._size > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _sizes_of(self, keys: List[str]) -> Dict[str, int]:
+        sizes = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            sizes.update(self._conn.execute(
+                f"SELECT key, size FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall())
+        return sizes
+
+    def _evict(self):
+        # Evict down to 90% of the budget so eviction does not run on every write
+        target_count = int(self.max_entries * 0.9)
+        target_size = int(self.max_bytes * 0.9)
+        evict = []
+        for key, size in self._conn.execute("SELECT key, size FROM embeddings ORDER BY last_used"):
+            if self._count <= target_count and self._size <= target_size:
+                break
+            evict.append((key,))
+            self._count -= 1
+            self._size -= size
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", evict)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": self._count, "bytes": self._size, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+# Ids are stored in a signed int64 column, so only 63 bits are used
+ID_MASK = (1 << 63) - 1
+
+
+def digest64(relative_path: str) -> int:
+    """Stable 63-bit BLAKE2b digest of a relative posix path"""
+    digest = hashlib.blake2b(relative_path.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') & ID_MASK
+
+
+class FileIdTable:
+    """Persisted relative path -> file id assignments for one table
+
+    A file's id is the digest of its path unless that id is already held by
+    another path, in which case it is re-derived deterministically until a
+    free one is found. Ids are assigned once per file (not per chunk) and kept
+    until the file is removed, so deletes and filters by id are exact.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.ids: Dict[str, int] = {}
+        self._paths: Dict[int, str] = {}
+        self.collisions = 0
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.ids)
+
+    def load(self) -> 'FileIdTable':
+        if not self.path.exists():
+            return self
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable file id table {self.path}: {str(e)}")
+            return self
+        if data.get('version') != self.VERSION:
+            return self
+
+        self.ids = {path: int(file_id) for path, file_id in data['ids'].items()}
+        self._paths = {file_id: path for path, file_id in self.ids.items()}
+        self.dirty = False
+        return self
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'ids': self.ids}, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def _bind(self, relative_path: str, file_id: int):
+        self.ids[relative_path] = file_id
+        self._paths[file_id] = relative_path
+        self.dirty = True
+
+    def get(self, relative_path: str) -> int:
+        """Return the id of relative_path, assigning a collision-free one if it has none"""
+        file_id = self.ids.get(relative_path)
+        if file_id is not None:
+            return file_id
+
+        file_id = digest64(relative_path)
+        attempt = 0
+        while file_id in self._paths:
+            self.collisions += 1
+            attempt += 1
+            print(f"File id collision between {relative_path} and {self._paths[file_id]}")
+            file_id = digest64(f"{relative_path}\0{attempt}")
+        self._bind(relative_path, file_id)
+        return file_id
+
+    def lookup(self, relative_path: str) -> Optional[int]:
+        """The id of relative_path if it has one, without assigning"""
+        return self.ids.get(relative_path)
+
+    def remove(self, relative_paths: Iterable[str]):
+        for relative_path in relative_paths:
+            file_id = self.ids.pop(relative_path, None)
+            if file_id is not None:
+                self._paths.pop(file_id, None)
+                self.dirty = True
+
+    def clear(self):
+        self.ids.clear()
+        self._paths.clear()
+        self.dirty = True
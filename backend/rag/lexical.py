@@ -0,0 +1,200 @@
+import math
+import pickle
+import re
+import sqlite3
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from rag.chunks import Chunk
+
+_IDENTIFIER = re.compile(r'[A-Za-z_$][A-Za-z0-9_$]*|[0-9]+')
+_CAMEL_PARTS = re.compile(r'[A-Z]+(?=[A-Z][a-z0-9])|[A-Z]?[a-z0-9]+|[A-Z]+')
+_SYMBOL_QUERY = re.compile(r'^\s*[`\'"]?([A-Za-z_$][\w$]*(?:(?:\.|::)[A-Za-z_$][\w$]*)*)[`\'"]?(?:\(\))?\s*\??\s*$')
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into identifier tokens plus their camelCase/snake_case parts
+
+    `parseHTTPResponse_v2` yields `parsehttpresponse_v2`, `parse`, `http`,
+    `response` and `v2`, so both exact identifiers and their words match.
+    """
+    tokens = []
+    for identifier in _IDENTIFIER.findall(text):
+        lowered = identifier.lower()
+        tokens.append(lowered)
+        parts = [part.lower() for piece in identifier.split('_') for part in _CAMEL_PARTS.findall(piece)]
+        if len(parts) > 1 or (parts and parts[0] != lowered):
+            tokens.extend(part for part in parts if len(part) > 1)
+    return tokens
+
+
+def is_symbol_query(question: str) -> bool:
+    """True for bare identifier lookups like `CodeAnalysisRAG.index_code` or `path_to_int64?`"""
+    return bool(_SYMBOL_QUERY.match(question))
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = 60) -> List[Hashable]:
+    """Merge several rankings into one by summing 1 / (k + rank) per item"""
+    scores: Dict[Hashable, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda key: scores[key], reverse=True)
+
+
+class LexicalIndex:
+    """In-process BM25 inverted index over chunk identifiers
+
+    Chunks are tracked by document id and grouped by file so a re-indexed or
+    deleted file can drop its postings. The index is persisted per file in a
+    SQLite database next to the LanceDB table, so saving after a delta only
+    rewrites the files it touched; the postings are rebuilt on load.
+    """
+
+    VERSION = 2
+
+    def __init__(self, path: Union[str, Path], k1: float = 1.2, b: float = 0.75):
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)  # term -> {doc_id: tf}
+        self.doc_lengths: Dict[str, int] = {}
+        self.doc_terms: Dict[str, List[str]] = {}
+        self.file_docs: Dict[str, List[str]] = defaultdict(list)
+        self.total_length = 0
+        self.dirty = False
+        self._dirty_files: Set[str] = set()
+        self._cleared = False
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            # One row per file: the pickled [(doc_id, {term: tf}), ...] of its chunks
+            self._conn.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, docs BLOB NOT NULL)")
+            version = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if version is None or version[0] != self.VERSION:
+                self._conn.execute("DELETE FROM files")
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)",
+                                   (self.VERSION,))
+            self._conn.commit()
+        return self._conn
+
+    def load(self) -> 'LexicalIndex':
+        if not self.path.exists():
+            return self
+        try:
+            rows = self._connect().execute("SELECT path, docs FROM files").fetchall()
+        except sqlite3.Error as e:
+            print(f"Ignoring unreadable lexical index {self.path}: {str(e)}")
+            return self
+
+        for file_path, docs in rows:
+            for doc_id, counts in pickle.loads(docs):
+                self._add_counts(file_path, doc_id, counts)
+        self.dirty = False
+        self._dirty_files.clear()
+        return self
+
+    def save(self):
+        """Write the files changed since the last save"""
+        conn = self._connect()
+        if self._cleared:
+            conn.execute("DELETE FROM files")
+        upserts, deletes = [], []
+        for file_path in self._dirty_files:
+            doc_ids = self.file_docs.get(file_path)
+            if not doc_ids:
+                deletes.append((file_path,))
+                continue
+            docs = [(doc_id, {term: self.postings[term][doc_id] for term in self.doc_terms[doc_id]})
+                    for doc_id in doc_ids if doc_id in self.doc_terms]
+            upserts.append((file_path, pickle.dumps(docs, protocol=pickle.HIGHEST_PROTOCOL)))
+        conn.executemany("DELETE FROM files WHERE path = ?", deletes)
+        conn.executemany("INSERT OR REPLACE INTO files (path, docs) VALUES (?, ?)", upserts)
+        conn.commit()
+        self._dirty_files.clear()
+        self._cleared = False
+        self.dirty = False
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _add_counts(self, file_path: str, doc_id: str, counts: Dict[str, int]):
+        for term, tf in counts.items():
+            self.postings[term][doc_id] = tf
+        length = sum(counts.values())
+        self.doc_lengths[doc_id] = length
+        self.doc_terms[doc_id] = list(counts)
+        self.file_docs[file_path].append(doc_id)
+        self.total_length += length
+
+    def add(self, file_path: str, doc_id: str, text: str):
+        if doc_id in self.doc_lengths:
+            self.remove_doc(doc_id)
+        self._add_counts(file_path, doc_id, Counter(tokenize(text)))
+        self._dirty_files.add(file_path)
+        self.dirty = True
+
+    def add_documents(self, chunks: Iterable[Chunk]):
+        # The path comes from the shared FileInfo, not the per-chunk metadata dict
+        for chunk in chunks:
+            self.add(chunk.file.file_path, chunk.doc_id, chunk.content)
+
+    def remove_doc(self, doc_id: str):
+        for term in self.doc_terms.pop(doc_id, []):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id, 0)
+        self.dirty = True
+
+    def remove_files(self, file_paths: Iterable[str]):
+        for file_path in file_paths:
+            doc_ids = self.file_docs.pop(file_path, None)
+            if doc_ids is None:
+                continue
+            for doc_id in doc_ids:
+                self.remove_doc(doc_id)
+            self._dirty_files.add(file_path)
+            self.dirty = True
+
+    def clear(self):
+        self.postings.clear()
+        self.doc_lengths.clear()
+        self.doc_terms.clear()
+        self.file_docs.clear()
+        self.total_length = 0
+        self._dirty_files.clear()
+        self._cleared = True
+        self.dirty = True
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """Return up to `limit` (doc_id, bm25 score) pairs, best first"""
+        if not self.doc_lengths:
+            return []
+
+        doc_count = len(self.doc_lengths)
+        avg_length = self.total_length / doc_count or 1.0
+        scores: Dict[str, float] = defaultdict(float)
+        for term, query_tf in Counter(tokenize(query)).items():
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += query_tf * idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+
+@dataclass
+class FileRecord:
+    """Indexed state of a single source file"""
+    mtime_ns: int
+    size: int
+    content_hash: str
+    chunk_ids: List[str] = field(default_factory=list)
+
+
+def hash_file(file_path: Union[str, Path], block_size: int = 1 << 20) -> str:
+    """Compute the sha256 content hash of a file"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FileManifest:
+    """Persistent path -> (mtime, size, content hash, chunk ids) manifest
+
+    Used to decide which files of a codebase changed since the last index run,
+    so only those are re-loaded, re-embedded and upserted.
+    """
+
+    VERSION = 1
+
+    def __init__(self, manifest_path: Union[str, Path]):
+        self.manifest_path = Path(manifest_path)
+        self.root: Optional[str] = None
+        self.settings: Optional[str] = None
+        self.files: Dict[str, FileRecord] = {}
+        self.dirty = False
+
+    def load(self) -> 'FileManifest':
+        """Load the manifest from disk, starting empty if it is missing or unreadable"""
+        self.root = None
+        self.files = {}
+        self.dirty = False
+        if not self.manifest_path.exists():
+            return self
+
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable manifest {self.manifest_path}: {str(e)}")
+            return self
+
+        if data.get('version') != self.VERSION:
+            return self
+
+        self.root = data.get('root')
+        self.settings = data.get('settings')
+        self.files = {path: FileRecord(**record) for path, record in data.get('files', {}).items()}
+        return self
+
+    def save(self):
+        """Atomically write the manifest to disk"""
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(self.manifest_path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': self.VERSION,
+                'root': self.root,
+                'settings': self.settings,
+                'files': {path: asdict(record) for path, record in self.files.items()}
+            }, f)
+        os.replace(tmp_path, self.manifest_path)
+        self.dirty = False
+
+    def reset(self, root: str):
+        """Drop all records and bind the manifest to a new codebase root"""
+        self.root = root
+        self.files = {}
+        self.dirty = True
+
+    def invalidate(self, settings: str):
+        """Force every known file to be re-indexed, e.g. after the chunking settings changed
+
+        Records are kept (with their hashes cleared) so the old chunks are
+        still deleted when each file is re-indexed.
+        """
+        self.settings = settings
+        for record in self.files.values():
+            record.mtime_ns = -1
+            record.content_hash = ''
+        self.dirty = True
+
+    def get(self, relative_path: str) -> Optional[FileRecord]:
+        return self.files.get(relative_path)
+
+    def check(self, relative_path: str, file_path: Path) -> Optional[FileRecord]:
+        """Return a fresh record if the file changed since it was indexed, otherwise None
+
+        The mtime/size pair is used as a fast path; the content hash is only
+        computed when it differs, so touched-but-identical files are not re-indexed.
+        """
+        stat = file_path.stat()
+        previous = self.files.get(relative_path)
+        if previous and previous.mtime_ns == stat.st_mtime_ns and previous.size == stat.st_size:
+            return None
+
+        content_hash = hash_file(file_path)
+        if previous and previous.content_hash == content_hash:
+            previous.mtime_ns = stat.st_mtime_ns
+            previous.size = stat.st_size
+            self.dirty = True
+            return None
+
+        return FileRecord(mtime_ns=stat.st_mtime_ns, size=stat.st_size, content_hash=content_hash)
+
+    def update(self, relative_path: str, record: FileRecord):
+        self.files[relative_path] = record
+        self.dirty = True
+
+    def remove(self, relative_path: str) -> Optional[FileRecord]:
+        self.dirty = True
+        return self.files.pop(relative_path, None)
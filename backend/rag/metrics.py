@@ -0,0 +1,147 @@
+import contextvars
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Union
+
+_current_span: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('current_span', default=None)
+
+
+class _Timer:
+    """Running totals plus a window of recent durations for percentiles"""
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float, error: bool = False):
+        self.count += 1
+        self.errors += error
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_seconds": self.total,
+            "mean_ms": self.total / self.count * 1000 if self.count else None,
+            "p50_ms": self.quantile(0.5) * 1000 if self.recent else None,
+            "p95_ms": self.quantile(0.95) * 1000 if self.recent else None,
+            "max_ms": self.max * 1000,
+        }
+
+
+class MetricsRegistry:
+    """In-process counters and span timings, safe to update from any thread
+
+    `span` times a stage and records it under its name; spans nest through a
+    context variable, so the recent-span log shows which request a stage ran
+    under. `snapshot` returns everything as plain JSON-able data and
+    `write_prometheus` exports the same in Prometheus text format.
+    """
+
+    def __init__(self, window: int = 512, recent_spans: int = 100):
+        self.window = window
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._timers: Dict[str, _Timer] = {}
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=recent_spans)
+
+    def inc(self, name: str, value: float = 1):
+        if not value:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float, error: bool = False, parent: Optional[str] = None):
+        with self._lock:
+            timer = self._timers.get(name)
+            if timer is None:
+                timer = self._timers[name] = _Timer(self.window)
+            timer.observe(seconds, error)
+            self._recent.append({"name": name, "parent": parent, "ms": seconds * 1000,
+                                 "error": error, "end": time.time()})
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Time the enclosed block; works around `await`s in coroutines too"""
+        parent = _current_span.get()
+        token = _current_span.set(name)
+        started = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            _current_span.reset(token)
+            self.observe(name, time.perf_counter() - started, error, parent)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "uptime_seconds": time.time() - self.started,
+                "counters": dict(self._counters),
+                "spans": {name: timer.snapshot() for name, timer in self._timers.items()},
+                "recent_spans": list(self._recent),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+            self._recent.clear()
+
+    def to_prometheus(self, prefix: str = "coderag") -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, value in sorted(self._counters.items()):
+                metric = f"{prefix}_{_metric_name(name)}_total"
+                lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+
+            metric = f"{prefix}_span_seconds"
+            if self._timers:
+                lines.append(f"# TYPE {metric} summary")
+            for name, timer in sorted(self._timers.items()):
+                label = f'span="{name}"'
+                for q in (0.5, 0.95):
+                    value = timer.quantile(q)
+                    if value is not None:
+                        lines.append(f'{metric}{{{label},quantile="{q}"}} {value}')
+                lines.append(f"{metric}_sum{{{label}}} {timer.total}")
+                lines.append(f"{metric}_count{{{label}}} {timer.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Union[str, Path]):
+        """Atomically write the text exposition, e.g. for node_exporter's textfile collector"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+# Process-wide registry shared by the RAG pipeline and the webview bridge
+METRICS = MetricsRegistry()
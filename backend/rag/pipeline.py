@@ -0,0 +1,124 @@
+import asyncio
+from collections import deque
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, List, Optional, Union
+
+from rag.chunks import Chunk
+from rag.manifest import FileRecord
+
+_DONE = object()
+
+
+@dataclass
+class FileChunks:
+    """All chunks produced for one file, plus its pending manifest update"""
+    relative_path: str
+    documents: List[Chunk] = field(default_factory=list)
+    record: Optional[FileRecord] = None  # New manifest record, None when not tracked
+    stale: bool = False  # Previously stored chunks must be deleted first
+    removed: bool = False  # File no longer exists, only its old chunks are deleted
+    skipped: Optional[str] = None  # Sniffing reason the file was not loaded, if any
+
+
+@dataclass
+class DocumentBatch:
+    """Fixed-size slice of the chunk stream that is embedded and stored together"""
+    documents: List[Chunk] = field(default_factory=list)
+    started: List[FileChunks] = field(default_factory=list)  # First chunk is in this batch
+    completed: List[FileChunks] = field(default_factory=list)  # Last chunk is in this batch
+    embeddings: Optional[Any] = None  # (documents, dim) float32 matrix once embedded
+
+
+async def buffered(source: AsyncIterator, maxsize: int) -> AsyncIterator:
+    """Run an async iterator in a background task, buffering at most `maxsize` items
+
+    This decouples pipeline stages: the producer runs ahead of the consumer
+    but blocks once the bounded queue is full, so memory stays flat.
+    Exceptions raised by the producer are re-raised in the consumer.
+    """
+    queue = asyncio.Queue(maxsize=max(1, maxsize))
+
+    async def produce():
+        try:
+            async for item in source:
+                await queue.put(item)
+            await queue.put(_DONE)
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            await queue.put(e)
+
+    task = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+async def batch_file_chunks(files: AsyncIterator[FileChunks],
+                            batch_size: int) -> AsyncIterator[DocumentBatch]:
+    """Regroup a stream of per-file chunks into batches of at most `batch_size` documents
+
+    Large files are split across consecutive batches; files without chunks
+    (emptied or removed) ride along with the next batch.
+    """
+    batch = DocumentBatch()
+
+    async for file_chunks in files:
+        batch.started.append(file_chunks)
+        offset = 0
+        while len(file_chunks.documents) - offset > batch_size - len(batch.documents):
+            take = batch_size - len(batch.documents)
+            batch.documents.extend(file_chunks.documents[offset:offset + take])
+            offset += take
+            yield batch
+            batch = DocumentBatch()
+
+        batch.documents.extend(file_chunks.documents[offset:])
+        batch.completed.append(file_chunks)
+        if len(batch.documents) >= batch_size:
+            yield batch
+            batch = DocumentBatch()
+
+    if batch.documents or batch.started or batch.completed:
+        yield batch
+
+
+async def _aiter(items: Union[Iterable, AsyncIterable]) -> AsyncIterator:
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def ordered_map(items: Union[Iterable, AsyncIterable], fn: Callable[[Any], Awaitable[Any]],
+                      concurrency: int) -> AsyncIterator:
+    """Apply an async function to items with bounded concurrency, yielding in input order
+
+    At most `concurrency` calls are in flight; results are released strictly
+    in the order of `items`, so output is reproducible regardless of which
+    call finishes first.
+    """
+    pending = deque()
+    try:
+        async with aclosing(_aiter(items)) as source:
+            async for item in source:
+                pending.append(asyncio.create_task(fn(item)))
+                if len(pending) >= max(1, concurrency):
+                    yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
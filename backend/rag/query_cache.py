@@ -0,0 +1,86 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+
+@dataclass
+class _Entry:
+    key: str
+    vector: np.ndarray  # L2-normalized query embedding
+    result: Any
+    files: Set[str] = field(default_factory=set)
+    created: float = field(default_factory=time.monotonic)
+
+
+class QueryCache:
+    """Semantic cache of analyze_code results
+
+    A lookup hits when a stored entry has the same exact key (filters, top_k,
+    retrieval settings and index version) and a query embedding whose cosine
+    similarity is at least `threshold`. Entries expire after `ttl` seconds,
+    are evicted least-recently-used beyond `max_entries`, and are dropped as
+    soon as any file they were answered from is re-indexed.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl: float = 3600.0, max_entries: int = 256):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[int, _Entry]' = OrderedDict()
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self):
+        deadline = time.monotonic() - self.ttl
+        for entry_id in [entry_id for entry_id, entry in self._entries.items() if entry.created < deadline]:
+            del self._entries[entry_id]
+
+    def get(self, vector: Sequence[float], key: str) -> Optional[Tuple[Any, float]]:
+        """Return (result, similarity) of the closest fresh entry, or None on a miss"""
+        self._expire()
+        candidates = [(entry_id, entry) for entry_id, entry in self._entries.items() if entry.key == key]
+        if not candidates:
+            self.misses += 1
+            return None
+
+        query = self._normalize(vector)
+        similarities = np.stack([entry.vector for _, entry in candidates]) @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        entry_id, entry = candidates[best]
+        self._entries.move_to_end(entry_id)
+        self.hits += 1
+        return entry.result, float(similarities[best])
+
+    def put(self, vector: Sequence[float], key: str, result: Any, files: Iterable[str]):
+        self._entries[self._next_id] = _Entry(key, self._normalize(vector), result, set(files))
+        self._next_id += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_files(self, file_paths: Iterable[str]):
+        """Drop every entry answered from any of the given files"""
+        file_paths = set(file_paths)
+        if not file_paths or not self._entries:
+            return
+        for entry_id in [entry_id for entry_id, entry in self._entries.items() if entry.files & file_paths]:
+            del self._entries[entry_id]
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,149 @@
+import copy
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+from rag.app import CodeAnalysisRAG, SharedClients
+
+
+def project_table_name(root: Union[str, Path]) -> str:
+    """Stable, LanceDB-safe table name for a project root"""
+    root = os.path.normcase(str(Path(root).resolve()))
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', Path(root).name).strip('_').lower()[:32] or 'root'
+    digest = hashlib.sha1(root.encode('utf-8')).hexdigest()[:10]
+    return f"code_{slug}_{digest}"
+
+
+class ProjectRegistry:
+    """Per-project CodeAnalysisRAG instances backed by their own tables
+
+    Each project root gets its own LanceDB table (plus manifest and lexical
+    index), recorded in `projects.json` under the database path. Up to
+    `pool_size` initialized instances are kept warm, least-recently-used
+    first out; all of them share one LLM client, embedder and embedding
+    cache, so opening a project only costs opening its table. Pinned
+    instances (the current project, or one serving a request) are never
+    evicted; the pool may grow past `pool_size` until they are released.
+    """
+
+    def __init__(self, config: Dict[str, Any], pool_size: int = 3):
+        self.config = config
+        self.pool_size = max(1, pool_size)
+        self.db_path = Path(config["vector_store"].get("db_path", "./data/lancedb"))
+        self.projects_path = self.db_path / "projects.json"
+        self.projects: Dict[str, Dict[str, Any]] = {}  # root -> {table_name, last_opened}
+        self.clients: Optional[SharedClients] = None
+        self._pool: 'OrderedDict[str, CodeAnalysisRAG]' = OrderedDict()
+        self._pins: Dict[str, int] = {}  # root -> number of holders
+        self._load()
+
+    def _load(self):
+        if not self.projects_path.exists():
+            return
+        try:
+            with open(self.projects_path, 'r', encoding='utf-8') as f:
+                self.projects = json.load(f).get("projects", {})
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable project registry {self.projects_path}: {str(e)}")
+
+    def _save(self):
+        self.projects_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.projects_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"projects": self.projects}, f, indent=2)
+        os.replace(tmp_path, self.projects_path)
+
+    @staticmethod
+    def _key(root: Optional[Union[str, Path]]) -> str:
+        return str(Path(root).resolve()) if root else ""
+
+    def _project_config(self, key: str) -> Dict[str, Any]:
+        config = copy.deepcopy(self.config)
+        if key:
+            config["vector_store"]["table_name"] = self.projects[key]["table_name"]
+        return config
+
+    async def open(self, root: Optional[Union[str, Path]] = None, pin: bool = False) -> CodeAnalysisRAG:
+        """Return the warm instance for root, creating it if needed
+
+        `None` opens the table named in the base config, for callers that
+        index without having opened a project. With `pin`, the instance is
+        pinned until a matching `release`.
+        """
+        key = self._key(root)
+        if key:
+            project = self.projects.setdefault(key, {"table_name": project_table_name(key)})
+            project["last_opened"] = time.time()
+            self._save()
+
+        rag = self._pool.get(key)
+        if rag is not None:
+            self._pool.move_to_end(key)
+        else:
+            if self.clients is None:
+                self.clients = await SharedClients.create(self.config)
+            rag = CodeAnalysisRAG(self._project_config(key))
+            await rag.initialize(self.clients)
+            self._pool[key] = rag
+
+        if pin:
+            self.pin(rag)
+        await self._evict(keep=key)
+        return rag
+
+    def _key_of(self, rag: CodeAnalysisRAG) -> Optional[str]:
+        return next((key for key, pooled in self._pool.items() if pooled is rag), None)
+
+    def pin(self, rag: CodeAnalysisRAG):
+        """Keep a pooled instance from being evicted until it is released"""
+        key = self._key_of(rag)
+        if key is not None:
+            self._pins[key] = self._pins.get(key, 0) + 1
+
+    async def release(self, rag: CodeAnalysisRAG):
+        """Drop one pin of the instance, evicting it if the pool is over size"""
+        key = self._key_of(rag)
+        if key in self._pins:
+            self._pins[key] -= 1
+            if not self._pins[key]:
+                del self._pins[key]
+        await self._evict()
+
+    @asynccontextmanager
+    async def pinned(self, rag: CodeAnalysisRAG) -> AsyncIterator[CodeAnalysisRAG]:
+        """Pin the instance for the duration of a request"""
+        self.pin(rag)
+        try:
+            yield rag
+        finally:
+            await self.release(rag)
+
+    async def _evict(self, keep: Optional[str] = None):
+        # Least recently used first, skipping pinned instances and the one being opened
+        excess = len(self._pool) - self.pool_size
+        for key in [key for key in self._pool if key not in self._pins and key != keep][:max(0, excess)]:
+            await self._pool.pop(key).close()
+
+    def list_projects(self) -> List[Dict[str, Any]]:
+        """Known projects, most recently opened first"""
+        return [
+            {"root_path": root, "table_name": project["table_name"],
+             "last_opened": project.get("last_opened"), "open": root in self._pool}
+            for root, project in sorted(self.projects.items(),
+                                        key=lambda item: item[1].get("last_opened") or 0, reverse=True)
+        ]
+
+    async def close(self):
+        self._pins.clear()
+        while self._pool:
+            _, rag = self._pool.popitem(last=False)
+            await rag.close()
+        if self.clients is not None:
+            await self.clients.close()
+            self.clients = None
@@ -0,0 +1,96 @@
+from typing import Any, List, Sequence, Tuple
+
+import numpy as np
+
+from rag.lexical import tokenize
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class Reranker:
+    """Second retrieval stage reranking an overfetched candidate set locally
+
+    A candidate's relevance is its cosine similarity to the query, plus the
+    share of query terms it contains (weighted by how rare each term is among
+    the candidates) and a boost when a query term names its symbol. The final
+    chunks are then picked by maximal marginal relevance over the candidates'
+    embeddings, with a penalty per chunk already picked from the same file, so
+    near-duplicates and single-file pile-ups give way to other context.
+    Candidates at least `duplicate_threshold` similar to a picked chunk are
+    dropped outright.
+    """
+
+    def __init__(self,
+                 candidates: int = 50,
+                 lexical_weight: float = 0.3,
+                 symbol_weight: float = 0.2,
+                 mmr_lambda: float = 0.7,
+                 file_penalty: float = 0.05,
+                 duplicate_threshold: float = 0.98):
+        self.candidates = candidates
+        self.lexical_weight = lexical_weight
+        self.symbol_weight = symbol_weight
+        self.mmr_lambda = mmr_lambda
+        self.file_penalty = file_penalty
+        self.duplicate_threshold = duplicate_threshold
+
+    def relevance(self, question: str, documents: Sequence[Any], similarities: np.ndarray) -> np.ndarray:
+        """Similarity plus the lexical overlap and symbol boosts of each candidate"""
+        terms = {term: column for column, term in enumerate(dict.fromkeys(tokenize(question)))}
+        if not terms:
+            return similarities
+
+        contains = np.zeros((len(documents), len(terms)), dtype=bool)
+        symbol_match = np.zeros(len(documents), dtype=bool)
+        for row, doc in enumerate(documents):
+            for term in terms.keys() & set(tokenize(doc.content)):
+                contains[row, terms[term]] = True
+            symbol = doc.metadata.get("symbol")
+            symbol_match[row] = bool(symbol) and not terms.keys().isdisjoint(tokenize(symbol))
+
+        # Terms found in every candidate say little about which one is relevant
+        found = contains.sum(axis=0)
+        weights = np.where(found > 0, np.log((len(documents) + 1) / (found + 0.5)), 0.0)
+        total = weights.sum()
+        overlap = contains @ weights / total if total > 0 else np.zeros(len(documents))
+        return similarities + self.lexical_weight * overlap + self.symbol_weight * symbol_match
+
+    def select(self, relevance: np.ndarray, vectors: np.ndarray, file_paths: Sequence[str],
+               top_k: int) -> List[int]:
+        """Greedy maximal marginal relevance selection of `top_k` candidate indices"""
+        # Relevance is rescaled to [0, 1] so it trades off evenly against similarity
+        spread = relevance.max() - relevance.min()
+        relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones(len(relevance))
+        unit = _unit_rows(vectors)
+        files = np.unique(np.asarray(file_paths, dtype=object), return_inverse=True)[1]
+        picked_per_file = np.zeros(files.max() + 1 if len(files) else 0)
+        max_similarity = np.zeros(len(relevance))
+        available = np.ones(len(relevance), dtype=bool)
+
+        selected = []
+        while len(selected) < top_k and available.any():
+            scores = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * max_similarity \
+                - self.file_penalty * picked_per_file[files]
+            scores[~available] = -np.inf
+            best = int(np.argmax(scores))
+            selected.append(best)
+            available[best] = False
+            similarity = unit @ unit[best]
+            available &= similarity < self.duplicate_threshold
+            max_similarity = np.maximum(max_similarity, similarity)
+            picked_per_file[files[best]] += 1
+        return selected
+
+    def rerank(self, question: str, documents: Sequence[Any], vectors: np.ndarray,
+               query_vector: Sequence[float], top_k: int) -> List[Tuple[int, float]]:
+        """Return (candidate index, relevance) pairs of the chosen chunks, in order"""
+        if not len(documents):
+            return []
+        vectors = np.asarray(vectors, dtype=np.float32)
+        similarities = _unit_rows(vectors) @ _unit_rows(np.asarray(query_vector, dtype=np.float32))
+        relevance = self.relevance(question, documents, similarities)
+        file_paths = [doc.metadata.get("file_path") or "" for doc in documents]
+        return [(index, float(relevance[index])) for index in self.select(relevance, vectors, file_paths, top_k)]
@@ -0,0 +1,73 @@
+import os
+import re
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+SKIP_REASONS = ("too_large", "binary", "minified", "generated")
+
+GENERATED_MARKERS = (
+    "@generated",
+    "do not edit",
+    "code generated by",
+    "auto-generated",
+    "autogenerated",
+    "<auto-generated",
+    "generated by the protocol buffer compiler",
+    "this file was automatically generated",
+)
+
+# Names that give the file away without reading it
+_GENERATED_NAME = re.compile(r'.*(?:_pb2(?:_grpc)?\.py|\.pb\.(?:go|cc|h)|\.pb\.gw\.go|_generated\.\w+|'
+                             r'\.generated\.\w+|\.g\.dart|\.designer\.cs)$', re.IGNORECASE)
+_MINIFIED_NAME = re.compile(r'.*[.-]min\.(?:js|css|mjs)$|.*\.bundle\.js$', re.IGNORECASE)
+
+
+class FileSniffer:
+    """Cheap pre-load checks that keep junk files out of the index
+
+    A file is skipped when it exceeds `max_file_bytes`, has a NUL byte in
+    its first block (binary), looks minified (average line length of the
+    first block above `max_mean_line_length`) or carries a "generated"
+    marker in its header. Only one block of at most `sniff_bytes` is read.
+    """
+
+    def __init__(self,
+                 max_file_bytes: int = 1_000_000,
+                 sniff_bytes: int = 8192,
+                 max_mean_line_length: int = 250,
+                 header_lines: int = 15,
+                 generated_markers: Iterable[str] = GENERATED_MARKERS):
+        self.max_file_bytes = max_file_bytes
+        self.sniff_bytes = sniff_bytes
+        self.max_mean_line_length = max_mean_line_length
+        self.header_lines = header_lines
+        self.generated_markers = tuple(marker.lower() for marker in generated_markers)
+
+    def sniff(self, path: Union[str, Path], size: Optional[int] = None) -> Optional[str]:
+        """Return the reason to skip the file, or None if it should be loaded"""
+        name = os.path.basename(path)
+        if _MINIFIED_NAME.match(name):
+            return "minified"
+        if _GENERATED_NAME.match(name):
+            return "generated"
+
+        if size is None:
+            size = os.stat(path).st_size
+        if size > self.max_file_bytes:
+            return "too_large"
+
+        with open(path, 'rb') as f:
+            block = f.read(self.sniff_bytes)
+        if b'\0' in block:
+            return "binary"
+
+        lines = block.split(b'\n')
+        # The last piece may be cut off by the block boundary; ignore it unless it is all there is
+        complete = lines[:-1] if len(lines) > 1 and len(block) == self.sniff_bytes else lines
+        if sum(map(len, complete)) / len(complete) > self.max_mean_line_length:
+            return "minified"
+
+        header = b'\n'.join(lines[:self.header_lines]).decode('utf-8', errors='replace').lower()
+        if any(marker in header for marker in self.generated_markers):
+            return "generated"
+        return None
@@ -0,0 +1,48 @@
+from pathlib import Path
+from typing import List, Sequence, Tuple, Union
+
+
+def decode_source(data) -> Tuple[str, bool]:
+    """Decode UTF-8 file contents, returning the text and whether it was valid
+
+    Invalid bytes are kept as surrogate escapes so that byte offsets computed
+    from the text still match the file; use `clean_text` before storing it.
+    """
+    try:
+        return str(data, 'utf-8'), True
+    except UnicodeDecodeError:
+        return str(data, 'utf-8', 'surrogateescape'), False
+
+
+def clean_text(text: str) -> str:
+    """Replace the surrogate escapes left by `decode_source` with U+FFFD"""
+    return text.encode('utf-8', 'surrogateescape').decode('utf-8', 'replace')
+
+
+def line_byte_offsets(lines: Sequence[str]) -> List[int]:
+    """Byte offset of the start of every line, plus the end of the last one"""
+    offsets = [0]
+    position = 0
+    for line in lines:
+        position += len(line.encode('utf-8', 'surrogateescape')) if not line.isascii() else len(line)
+        offsets.append(position)
+    return offsets
+
+
+class SourceReader:
+    """Reads chunk text back from the indexed files by byte range
+
+    Used when chunk text is not stored in the table: each file is opened once
+    per call and only the requested ranges are read and decoded.
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+
+    def read(self, relative_path: str, ranges: Sequence[Tuple[int, int]]) -> List[str]:
+        texts = []
+        with open(self.root / relative_path, 'rb') as f:
+            for start, end in ranges:
+                f.seek(start)
+                texts.append(str(f.read(end - start), 'utf-8', 'replace'))
+        return texts
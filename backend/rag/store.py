@@ -0,0 +1,357 @@
+import asyncio
+import math
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+import lancedb
+import numpy as np
+import pyarrow as pa
+
+from rag.chunks import table_schema
+from rag.walker import escape_regex, translate_glob
+
+# filter_criteria keys that map straight onto metadata columns
+FILTER_COLUMNS = {
+    "language": "language",
+    "extension": "extension",
+    "code_type": "code_type",
+    "file_path": "file_path",
+}
+
+# Low-cardinality columns get bitmap indexes, the rest btree indexes
+SCALAR_INDEX_COLUMNS = {
+    "language": "BITMAP",
+    "extension": "BITMAP",
+    "code_type": "BITMAP",
+    "file_path": "BTREE",
+    "index": "BTREE",
+}
+
+DEFAULT_VECTOR_INDEX = {
+    "min_rows": 50_000,  # Brute force is fast enough below this
+    "index_type": "IVF_PQ",
+    "metric": "cosine",
+    "num_partitions": None,  # Defaults to sqrt(rows)
+    "num_sub_vectors": None,  # Defaults to a divisor of the vector dimension
+    "rebuild_fraction": 0.25,  # Full rebuild once unindexed rows exceed this share
+    "nprobes": None,
+    "refine_factor": None,
+}
+
+DEFAULT_TABLE_MAINTENANCE = {
+    "optimize_every": 20,  # Writes (appends and deletes) between compactions
+    "cleanup_older_than": 3600,  # Seconds older table versions are kept for running readers
+}
+
+
+def _quote(value: Any) -> str:
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def build_filter(filter_criteria: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Translate analyze_code filter_criteria into a LanceDB SQL predicate
+
+    Supported keys are `language`, `extension`, `code_type` and `file_path`
+    (a value or a list of values), `path_prefix` and `path_glob`. Unknown
+    keys raise ValueError rather than being silently ignored.
+    """
+    if not filter_criteria:
+        return None
+
+    clauses = []
+    for key, value in filter_criteria.items():
+        if value is None:
+            continue
+        if key in FILTER_COLUMNS:
+            column = FILTER_COLUMNS[key]
+            if key == "extension":
+                value = [v.lstrip('.') for v in value] if isinstance(value, (list, tuple, set)) \
+                    else str(value).lstrip('.')
+            if isinstance(value, (list, tuple, set)):
+                clauses.append(f"`{column}` IN ({', '.join(_quote(v) for v in value)})")
+            else:
+                clauses.append(f"`{column}` = {_quote(value)}")
+        elif key in ("path_prefix", "path_glob"):
+            patterns = value if isinstance(value, (list, tuple, set)) else [value]
+            regexes = [
+                "^" + escape_regex(pattern.replace('\\', '/')) if key == "path_prefix"
+                else "^" + translate_glob(pattern.replace('\\', '/').lstrip('/')) + "$"
+                for pattern in patterns
+            ]
+            clauses.append("(" + " OR ".join(
+                f"regexp_like(`file_path`, {_quote(regex)})" for regex in regexes
+            ) + ")")
+        else:
+            raise ValueError(f"Unsupported filter criterion: {key}")
+
+    return " AND ".join(clauses) if clauses else None
+
+
+def vector_matrix(table: pa.Table, column: str = "vector") -> np.ndarray:
+    """View a fixed-size-list vector column as an (rows, dim) float32 array"""
+    vectors = table.column(column).combine_chunks()
+    return vectors.flatten().to_numpy(zero_copy_only=False).reshape(-1, vectors.type.list_size)
+
+
+class CodeTable:
+    """Owner of the LanceDB table holding the code chunks
+
+    The table is created here with the `table_schema` layout (chunk metadata
+    as flat columns, with the file's `index` id tying every chunk back to its
+    source file) and any table in another layout, such as one written by the
+    factory vector store, is dropped by `check_schema`. Chunks are appended as
+    Arrow record batches, and the maintenance operations incremental indexing
+    needs (deleting a file's chunks, ...) work directly on those columns.
+    """
+
+    FILE_ID_COLUMN = "index"
+    DOC_ID_COLUMN = "id"
+    VECTOR_COLUMN = "vector"
+
+    def __init__(self, db_path: Union[str, Path], table_name: str):
+        self.db_path = str(db_path)
+        self.table_name = table_name
+        self._db = None
+        self._writes = 0  # Appends and deletes since the table was last optimized
+
+    def _connect(self):
+        if self._db is None:
+            self._db = lancedb.connect(self.db_path)
+        return self._db
+
+    def _open(self):
+        db = self._connect()
+        if self.table_name not in db.table_names():
+            return None
+        return db.open_table(self.table_name)
+
+    def _check_schema(self) -> bool:
+        table = self._open()
+        if table is None:
+            return True
+
+        schema = table.schema
+        try:
+            expected = table_schema(schema.field(self.VECTOR_COLUMN).type.list_size)
+        except (KeyError, AttributeError):
+            expected = None
+        if expected is not None and all(
+                name in schema.names and schema.field(name).type == field.type
+                for name, field in zip(expected.names, expected)):
+            return True
+
+        print(f"Dropping table {self.table_name} with an outdated schema")
+        self._connect().drop_table(self.table_name)
+        return False
+
+    async def check_schema(self) -> bool:
+        """Drop the table if it was written with another column layout
+
+        Returns False when the table was dropped, in which case everything
+        has to be re-indexed.
+        """
+        return await asyncio.to_thread(self._check_schema)
+
+    def _clear(self):
+        if self._open() is not None:
+            self._connect().drop_table(self.table_name)
+        self._writes = 0
+
+    async def clear(self):
+        """Drop the table with all its chunks; the next append creates it again"""
+        await asyncio.to_thread(self._clear)
+
+    def _create(self, dimension: int):
+        return self._connect().create_table(self.table_name, schema=table_schema(dimension))
+
+    def _append(self, batches: List[pa.RecordBatch]):
+        # Concatenating record batches into a table does not copy them
+        data = pa.Table.from_batches(batches)
+        table = self._open()
+        if table is None:
+            table = self._create(data.schema.field(self.VECTOR_COLUMN).type.list_size)
+        table.add(data)
+        self._writes += 1
+
+    async def append(self, batches: Sequence[pa.RecordBatch]):
+        """Append record batches of chunks in one write, creating the table on first use"""
+        batches = [batch for batch in batches if batch.num_rows]
+        if batches:
+            await asyncio.to_thread(self._append, batches)
+
+    def _delete_files(self, file_ids: Iterable[int]):
+        table = self._open()
+        if table is None:
+            return
+
+        file_ids = sorted(set(file_ids))
+        # Keep predicates reasonably small for very large deltas
+        for start in range(0, len(file_ids), 1000):
+            ids = ", ".join(str(file_id) for file_id in file_ids[start:start + 1000])
+            table.delete(f"`{self.FILE_ID_COLUMN}` IN ({ids})")
+            self._writes += 1
+
+    def _ensure_scalar_indices(self, columns: Dict[str, str]):
+        table = self._open()
+        if table is None:
+            return
+
+        existing_columns = set(table.schema.names)
+        indexed = {column for index in table.list_indices() for column in index.columns}
+        for column, index_type in columns.items():
+            if column not in existing_columns or column in indexed:
+                continue
+            try:
+                table.create_scalar_index(column, index_type=index_type)
+            except TypeError:
+                # Older LanceDB releases only build btree indexes
+                table.create_scalar_index(column)
+
+    async def ensure_scalar_indices(self, columns: Optional[Dict[str, str]] = None):
+        """Create missing scalar indexes on the metadata columns used for filtering"""
+        await asyncio.to_thread(self._ensure_scalar_indices, columns or SCALAR_INDEX_COLUMNS)
+
+    def _vector_index(self, table):
+        for index in table.list_indices():
+            if list(index.columns) == [self.VECTOR_COLUMN]:
+                return index
+        return None
+
+    def _create_vector_index(self, table, rows: int, settings: Dict[str, Any]):
+        dim = table.schema.field(self.VECTOR_COLUMN).type.list_size
+        num_sub_vectors = settings["num_sub_vectors"] or next(
+            n for n in (dim // 16, dim // 8, dim // 4, dim // 2, 1) if n and dim % n == 0
+        )
+        print(f"Building {settings['index_type']} index over {rows} rows")
+        table.create_index(
+            metric=settings["metric"],
+            num_partitions=settings["num_partitions"] or max(1, int(math.sqrt(rows))),
+            num_sub_vectors=num_sub_vectors,
+            vector_column_name=self.VECTOR_COLUMN,
+            index_type=settings["index_type"],
+            replace=True
+        )
+
+    def _maintain_vector_index(self, settings: Dict[str, Any]) -> str:
+        table = self._open()
+        if table is None:
+            return "missing"
+
+        rows = table.count_rows()
+        if rows < settings["min_rows"]:
+            return "brute_force"
+
+        index = self._vector_index(table)
+        if index is None:
+            self._create_vector_index(table, rows, settings)
+            return "created"
+
+        stats = table.index_stats(index.name)
+        unindexed = getattr(stats, "num_unindexed_rows", 0) or 0
+        indexed = getattr(stats, "num_indexed_rows", rows) or rows
+        if unindexed > settings["rebuild_fraction"] * indexed:
+            # Partitions were trained on old data; retrain rather than append
+            self._create_vector_index(table, rows, settings)
+            return "rebuilt"
+        if unindexed:
+            # New rows are added to the index by the next `optimize`
+            return "unindexed"
+        return "current"
+
+    async def maintain_vector_index(self, settings: Optional[Dict[str, Any]] = None) -> str:
+        """Create or rebuild the ANN index depending on table size and churn
+
+        Returns what was done or found: "missing", "brute_force", "created",
+        "rebuilt", "unindexed" (rows waiting for `optimize`) or "current".
+        """
+        return await asyncio.to_thread(self._maintain_vector_index, {**DEFAULT_VECTOR_INDEX, **(settings or {})})
+
+    def _optimize(self, settings: Dict[str, Any], force: bool) -> bool:
+        table = self._open()
+        if table is None or not (force or self._writes >= settings["optimize_every"]):
+            return False
+
+        # Compacts small fragments, removes old versions and brings the scalar
+        # and vector indexes up to date with the rows written since
+        table.optimize(cleanup_older_than=timedelta(seconds=settings["cleanup_older_than"]))
+        self._writes = 0
+        return True
+
+    async def optimize(self, settings: Optional[Dict[str, Any]] = None, force: bool = False) -> bool:
+        """Optimize the table once `optimize_every` writes have accumulated, or now with `force`
+
+        Every append and delete leaves a fragment and a table version behind,
+        with or without an ANN index. Returns whether the table was optimized.
+        """
+        return await asyncio.to_thread(self._optimize, {**DEFAULT_TABLE_MAINTENANCE, **(settings or {})}, force)
+
+    def _columns(self, table, with_vectors: bool) -> List[str]:
+        return [name for name in table.schema.names if with_vectors or name != self.VECTOR_COLUMN]
+
+    def _search(self, vector: Sequence[float], limit: int, where: Optional[str],
+                nprobes: Optional[int], refine_factor: Optional[int], with_vectors: bool) -> Optional[pa.Table]:
+        table = self._open()
+        if table is None:
+            return None
+
+        query = table.search(np.asarray(vector, dtype=np.float32), vector_column_name=self.VECTOR_COLUMN)
+        # Naming _distance keeps it in the output once LanceDB stops adding it implicitly
+        query = query.select(self._columns(table, with_vectors) + ["_distance"]).limit(limit)
+        if where:
+            # Prefilter so the limit applies to matching rows only
+            query = query.where(where, prefilter=True)
+        if nprobes:
+            query = query.nprobes(nprobes)
+        if refine_factor:
+            query = query.refine_factor(refine_factor)
+        return query.to_arrow()
+
+    async def search_arrow(self, vector: Sequence[float], limit: int = 5,
+                           where: Optional[str] = None,
+                           nprobes: Optional[int] = None,
+                           refine_factor: Optional[int] = None,
+                           with_vectors: bool = False) -> Optional[pa.Table]:
+        """Nearest-neighbour search returning an Arrow table, or None if there is no table yet
+
+        `where` restricts results with a SQL predicate; `nprobes` and
+        `refine_factor` trade latency for recall once an ANN index exists.
+        The vector column is only read back with `with_vectors`; use
+        `vector_matrix` to view it as a NumPy array.
+        """
+        return await asyncio.to_thread(self._search, vector, limit, where, nprobes, refine_factor, with_vectors)
+
+    async def search(self, vector: Sequence[float], limit: int = 5,
+                     where: Optional[str] = None,
+                     nprobes: Optional[int] = None,
+                     refine_factor: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Nearest-neighbour search returning rows without their vectors"""
+        result = await self.search_arrow(vector, limit, where, nprobes, refine_factor)
+        return result.to_pylist() if result is not None else []
+
+    def _fetch(self, doc_ids: List[str], where: Optional[str]) -> List[Dict[str, Any]]:
+        table = self._open()
+        if table is None or not doc_ids:
+            return []
+
+        predicate = f"`{self.DOC_ID_COLUMN}` IN ({', '.join(_quote(doc_id) for doc_id in doc_ids)})"
+        if where:
+            predicate = f"{predicate} AND ({where})"
+        query = table.search().where(predicate).select(self._columns(table, False))
+        return query.limit(len(doc_ids)).to_arrow().to_pylist()
+
+    async def fetch(self, doc_ids: Sequence[str], where: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Fetch rows by document id, in the order given, optionally restricted by a predicate"""
+        rows = await asyncio.to_thread(self._fetch, list(doc_ids), where)
+        by_id = {row[self.DOC_ID_COLUMN]: row for row in rows}
+        return [by_id[doc_id] for doc_id in doc_ids if doc_id in by_id]
+
+    async def delete_files(self, file_ids: Iterable[int]):
+        """Delete all chunks belonging to the given file ids"""
+        file_ids = list(file_ids)
+        if file_ids:
+            await asyncio.to_thread(self._delete_files, file_ids)
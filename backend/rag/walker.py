@@ -0,0 +1,314 @@
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+IGNORE_FILE_NAMES = ('.gitignore', '.coderagignore')
+
+_REGEX_META = set('\\.^$*+?()[]{}|')
+
+
+def escape_regex(text: str) -> str:
+    """Escape only regex metacharacters, so the result is valid for Python and Rust regex engines"""
+    return ''.join('\\' + c if c in _REGEX_META else c for c in text)
+
+
+def translate_glob(pattern: str) -> str:
+    """Translate a gitignore-style glob into a regex without capturing groups
+
+    `*` and `?` do not cross `/`, while `**` matches any number of directories.
+    """
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith('**/', i) and (i == 0 or pattern[i - 1] == '/'):
+            out.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i) and i + 2 == n and (i == 0 or pattern[i - 1] == '/'):
+            out.append('.*')
+            i += 2
+        elif c == '*':
+            out.append('[^/]*')
+            i += 1
+        elif c == '?':
+            out.append('[^/]')
+            i += 1
+        elif c == '[':
+            j = i + 1
+            if j < n and pattern[j] in '!^':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            while j < n and pattern[j] != ']':
+                j += 1
+            if j >= n:
+                out.append(escape_regex(c))
+                i += 1
+                continue
+            body = pattern[i + 1:j]
+            if body[:1] in ('!', '^'):
+                body = '^' + body[1:]
+            out.append('[' + body.replace('\\', '\\\\') + ']')
+            i = j + 1
+        elif c == '\\' and i + 1 < n:
+            out.append(escape_regex(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(escape_regex(c))
+            i += 1
+    return ''.join(out)
+
+
+def parse_ignore_line(line: str) -> Optional[Tuple[str, bool, bool]]:
+    """Parse one gitignore line into (regex, negated, directory_only), or None if blank"""
+    line = line.rstrip('\r\n')
+    # Trailing spaces are ignored unless escaped
+    while line.endswith(' ') and not line.endswith('\\ '):
+        line = line[:-1]
+    if not line or line.startswith('#'):
+        return None
+
+    negated = line.startswith('!')
+    if negated:
+        line = line[1:]
+    elif line.startswith('\\!') or line.startswith('\\#'):
+        line = line[1:]
+
+    directory_only = line.endswith('/')
+    line = line.rstrip('/')
+    # A slash anywhere but the end anchors the pattern to the ignore file's directory
+    anchored = '/' in line
+    line = line.lstrip('/')
+    if not line:
+        return None
+
+    regex = translate_glob(line)
+    if not anchored:
+        regex = '(?:.*/)?' + regex
+    return regex, negated, directory_only
+
+
+class IgnoreMatcher:
+    """All rules of one ignore file compiled into a single regex per entry kind
+
+    Rules are joined in reverse order so the first alternative that matches is
+    the last matching rule, which is the one gitignore semantics say wins.
+    """
+
+    def __init__(self, lines: Iterable[str], base: str = ''):
+        self.base = base
+        rules = [rule for rule in map(parse_ignore_line, lines) if rule]
+        self._file_regex = self._compile([rule for rule in rules if not rule[2]])
+        self._dir_regex = self._compile(rules)
+
+    @staticmethod
+    def _compile(rules: List[Tuple[str, bool, bool]]) -> Optional['re.Pattern']:
+        if not rules:
+            return None
+        alternatives = [
+            f"(?P<{'n' if negated else 'i'}{index}>{regex})"
+            for index, (regex, negated, _) in reversed(list(enumerate(rules)))
+        ]
+        return re.compile('|'.join(alternatives), re.DOTALL)
+
+    def __bool__(self):
+        return self._dir_regex is not None
+
+    def match(self, relative_path: str, is_dir: bool) -> Optional[bool]:
+        """True if ignored, False if explicitly re-included, None if no rule applies"""
+        regex = self._dir_regex if is_dir else self._file_regex
+        if regex is None:
+            return None
+        match = regex.fullmatch(relative_path)
+        if match is None:
+            return None
+        return match.lastgroup[0] == 'i'
+
+    @classmethod
+    def from_file(cls, ignore_file: Union[str, Path], base: str = '') -> 'IgnoreMatcher':
+        try:
+            with open(ignore_file, 'r', encoding='utf-8', errors='replace') as f:
+                return cls(f.readlines(), base)
+        except OSError:
+            return cls([], base)
+
+
+class CodebaseWalker:
+    """os.scandir based file walker honoring exclusions and nested ignore files
+
+    Excluded directories are pruned before they are descended into, and every
+    `.gitignore`/`.coderagignore` found on the way applies to its own subtree
+    with gitignore anchoring, directory-only and negation semantics. Entries
+    are visited in sorted order so walks are reproducible.
+
+    File names are classified (excluded or not, and language) through a
+    per-extension decision cache, and directory decisions and ignore rules
+    are cached per directory, so classifying a path list costs one lookup
+    per file plus work proportional to the number of distinct directories.
+    """
+
+    def __init__(self,
+                 excluded_dirs: Iterable[str] = (),
+                 excluded_files: Iterable[str] = (),
+                 excluded_extensions: Iterable[str] = (),
+                 included_extensions: Optional[Iterable[str]] = None,
+                 ignore_patterns: Iterable[str] = (),
+                 ignore_file_names: Iterable[str] = IGNORE_FILE_NAMES,
+                 languages: Optional[Dict[str, str]] = None):
+        excluded_dirs = [d.replace('\\', '/').strip('/') for d in excluded_dirs]
+        # Plain names match at any depth, entries with a slash match relative dir paths
+        self.excluded_dir_names = {d for d in excluded_dirs if '/' not in d}
+        self.excluded_dir_paths = {d for d in excluded_dirs if '/' in d}
+        self.excluded_files = set(excluded_files)
+        self.excluded_extensions = {ext.lower() for ext in excluded_extensions}
+        self.included_extensions = (
+            {ext.lower() for ext in included_extensions} if included_extensions is not None else None
+        )
+        self.languages = {ext.lower(): language for ext, language in (languages or {}).items()}
+        self.root_matcher = IgnoreMatcher(ignore_patterns)
+        self.ignore_file_names = tuple(ignore_file_names)
+        self._root_matchers = (self.root_matcher,) if self.root_matcher else ()
+        self._matcher_cache: Dict[Tuple[str, str], Tuple[IgnoreMatcher, ...]] = {}
+        self._dir_cache: Dict[Tuple[str, str], bool] = {}
+        # Raw extension -> (included, language); extensions repeat across a tree
+        self._extension_cache: Dict[str, Tuple[bool, Optional[str]]] = {}
+
+    def _dir_excluded(self, name: str, relative_path: str) -> bool:
+        if name in self.excluded_dir_names:
+            return True
+        return any(relative_path == d or relative_path.endswith('/' + d) for d in self.excluded_dir_paths)
+
+    def classify_name(self, name: str) -> Tuple[bool, Optional[str]]:
+        """(included, language) for a file name, before any ignore-file rules"""
+        if name in self.excluded_files:
+            return False, None
+        ext = os.path.splitext(name)[1]
+        decision = self._extension_cache.get(ext)
+        if decision is None:
+            lowered = ext.lower()
+            included = lowered not in self.excluded_extensions and (
+                self.included_extensions is None or lowered[1:] in self.included_extensions)
+            decision = self._extension_cache[ext] = (included, self.languages.get(lowered[1:]))
+        return decision
+
+    @staticmethod
+    def _ignored(matchers: Tuple[IgnoreMatcher, ...], relative_path: str, is_dir: bool) -> bool:
+        # Deeper ignore files take precedence over shallower ones
+        for matcher in reversed(matchers):
+            path = relative_path[len(matcher.base) + 1:] if matcher.base else relative_path
+            decision = matcher.match(path, is_dir)
+            if decision is not None:
+                return decision
+        return False
+
+    def _dir_matchers(self, directory: str, relative_dir: str,
+                      parent: Tuple[IgnoreMatcher, ...]) -> Tuple[IgnoreMatcher, ...]:
+        matchers = parent
+        for name in self.ignore_file_names:
+            ignore_file = os.path.join(directory, name)
+            if os.path.isfile(ignore_file):
+                matcher = IgnoreMatcher.from_file(ignore_file, relative_dir)
+                if matcher:
+                    matchers = matchers + (matcher,)
+        return matchers
+
+    def walk(self, root: Union[str, Path], recursive: bool = True) -> Iterator[Tuple[Path, str]]:
+        """Yield (absolute path, relative posix path) for every included file under root"""
+        root = os.fspath(root)
+        stack = [(root, '', self._dir_matchers(root, '', self._root_matchers))]
+
+        while stack:
+            directory, relative_dir, matchers = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError as e:
+                print(f"Error reading directory {directory}: {str(e)}")
+                continue
+
+            subdirs = []
+            for entry in entries:
+                relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    is_file = not is_dir and entry.is_file()
+                except OSError:
+                    continue
+
+                if is_dir:
+                    if not recursive or self._dir_excluded(entry.name, relative_path):
+                        continue
+                    if self._ignored(matchers, relative_path, True):
+                        continue
+                    subdirs.append((entry.path, relative_path))
+                elif is_file:
+                    if not self.classify_name(entry.name)[0] or \
+                            (matchers and self._ignored(matchers, relative_path, False)):
+                        continue
+                    yield Path(entry.path), relative_path
+
+            # Push in reverse so subdirectories are visited in sorted order
+            for path, relative_path in reversed(subdirs):
+                stack.append((path, relative_path, self._dir_matchers(path, relative_path, matchers)))
+
+    def _matchers_for(self, root: str, relative_dir: str) -> Tuple[IgnoreMatcher, ...]:
+        key = (root, relative_dir)
+        if key not in self._matcher_cache:
+            if relative_dir:
+                parent_dir = relative_dir.rpartition('/')[0]
+                parent = self._matchers_for(root, parent_dir)
+            else:
+                parent = self._root_matchers
+            self._matcher_cache[key] = self._dir_matchers(os.path.join(root, relative_dir), relative_dir, parent)
+        return self._matcher_cache[key]
+
+    def should_descend(self, root: Union[str, Path], relative_dir: str) -> bool:
+        """True if `walk` would descend into the directory relative_dir under root"""
+        root = os.fspath(root)
+        relative_dir = relative_dir.replace('\\', '/').strip('/')
+        return self._descend(root, relative_dir)
+
+    def _descend(self, root: str, relative_dir: str) -> bool:
+        if not relative_dir:
+            return True
+        key = (root, relative_dir)
+        decision = self._dir_cache.get(key)
+        if decision is None:
+            parent, _, name = relative_dir.rpartition('/')
+            decision = self._descend(root, parent) and not self._dir_excluded(name, relative_dir) and \
+                not self._ignored(self._matchers_for(root, parent), relative_dir, True)
+            self._dir_cache[key] = decision
+        return decision
+
+    def classify(self, root: Union[str, Path],
+                 relative_paths: Iterable[str]) -> List[Tuple[bool, Optional[str]]]:
+        """Apply the rules of `walk` to many paths at once, returning (included, language) for each
+
+        Ignore files are read lazily and cached per directory; call
+        `clear_cache` after ignore files change.
+        """
+        root = os.fspath(root)
+        results = []
+        for relative_path in relative_paths:
+            relative_path = relative_path.replace('\\', '/').strip('/')
+            relative_dir, _, name = relative_path.rpartition('/')
+            included, language = self.classify_name(name)
+            if included and not self._descend(root, relative_dir):
+                included = False
+            if included:
+                matchers = self._matchers_for(root, relative_dir)
+                included = not (matchers and self._ignored(matchers, relative_path, False))
+            results.append((included, language if included else None))
+        return results
+
+    def should_process(self, root: Union[str, Path], relative_path: str) -> bool:
+        """Apply the same rules as `walk` to a single path relative to root"""
+        return self.classify(root, [relative_path])[0][0]
+
+    def language_of(self, name: str) -> Optional[str]:
+        return self.classify_name(name)[1]
+
+    def clear_cache(self):
+        self._matcher_cache.clear()
+        self._dir_cache.clear()
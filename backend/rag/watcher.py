@@ -0,0 +1,94 @@
+import asyncio
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Union
+
+import watchfiles
+
+from rag.app import CodeAnalysisRAG
+
+
+class ProjectWatcher:
+    """Background task re-indexing a project's files as they change on disk
+
+    Change bursts (a git checkout, a formatter run) are debounced by
+    `watchfiles` into one set of paths, filtered with the same exclusion and
+    ignore-file rules as the codebase walk, and applied through
+    `CodeAnalysisRAG.index_changes` at most `max_batch_files` files at a time.
+    """
+
+    def __init__(self,
+                 rag: CodeAnalysisRAG,
+                 root_path: Union[str, Path],
+                 debounce_ms: int = 1600,
+                 max_batch_files: int = 32,
+                 on_update: Optional[Callable[[Dict[str, Any]], Any]] = None):
+        self.rag = rag
+        self.root_path = Path(root_path).resolve()
+        self.debounce_ms = debounce_ms
+        self.max_batch_files = max_batch_files
+        self.on_update = on_update
+        self._stop = None
+        self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start watching on the running event loop"""
+        if self.running:
+            return
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _relative(self, path: str) -> Optional[str]:
+        try:
+            return Path(path).relative_to(self.root_path).as_posix()
+        except ValueError:
+            return None
+
+    def _filter(self, change: watchfiles.Change, path: str) -> bool:
+        relative_path = self._relative(path)
+        if relative_path in (None, '.'):
+            return False
+        walker = self.rag.walker
+        if os.path.basename(path) in walker.ignore_file_names:
+            return True
+        # Deleted entries may have been directories, so either rule can keep them
+        if change == watchfiles.Change.deleted or os.path.isdir(path):
+            return walker.should_descend(self.root_path, relative_path) or \
+                walker.should_process(self.root_path, relative_path)
+        return walker.should_process(self.root_path, relative_path)
+
+    async def _run(self):
+        async for changes in watchfiles.awatch(self.root_path,
+                                               watch_filter=self._filter,
+                                               debounce=self.debounce_ms,
+                                               stop_event=self._stop):
+            paths = {self._relative(path) for _, path in changes}
+            ignore_files = {path for path in paths if path.rpartition('/')[2] in self.rag.walker.ignore_file_names}
+            if ignore_files:
+                # Rules changed: re-read them, and re-check the directories they govern
+                self.rag.walker.clear_cache()
+                paths = (paths - ignore_files) | {path.rpartition('/')[0] for path in ignore_files}
+
+            paths = sorted(paths)
+            for start in range(0, len(paths), self.max_batch_files):
+                try:
+                    counts = await self.rag.index_changes(self.root_path, paths[start:start + self.max_batch_files])
+                except Exception as e:
+                    print(f"Error applying file changes: {str(e)}")
+                    continue
+                if self.on_update and (counts["files"] or counts["removed_files"]):
+                    self.on_update(counts)
@@ -0,0 +1,31 @@
+from pathlib import Path
+from typing import Any, Dict
+
+from bench.stubs import StubEmbedder, StubLLM
+from rag.app import CodeAnalysisRAG, SharedClients
+from rag.embedding import EmbeddingScheduler
+
+
+def make_config(workdir: Path, **overrides: Any) -> Dict[str, Any]:
+    config = {
+        "llm": {"type": "stub", "model_name": "stub"},
+        "embedder": {"type": "stub", "model_name": "stub"},
+        "vector_store": {
+            "type": "lancedb",
+            "db_path": str(workdir / "lancedb"),
+            "table_name": "test"
+        },
+        "embedding_cache": {"enabled": False},
+        "query_cache": {"enabled": False},
+        "watch": False,
+    }
+    config.update(overrides)
+    return config
+
+
+async def open_rag(workdir: Path, **overrides: Any) -> CodeAnalysisRAG:
+    """A CodeAnalysisRAG on a temporary database, driven by the deterministic stubs"""
+    embedder = StubEmbedder(dimension=32)
+    rag = CodeAnalysisRAG(make_config(workdir, **overrides))
+    await rag.initialize(SharedClients(StubLLM(), embedder, None, EmbeddingScheduler(embedder)))
+    return rag
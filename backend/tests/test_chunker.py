@@ -0,0 +1,34 @@
+from rag.chunker import CodeChunker, split_lines
+from rag.loading import CodeFileLoader
+from rag.source import SourceReader
+
+# Form feeds and unicode separators are not line ends for ast, only \n and \r are
+SOURCE = (
+    "import os\n"
+    "\x0c\n"
+    "def first():\n"
+    "    \"\"\"Paged\x0cdocstring with a\u2028separator\"\"\"\n"
+    "    return os.sep\n"
+    "\n"
+    "def second():\r\n"
+    "    return 'é'\r\n"
+)
+
+
+def test_split_lines_matches_python_line_ends():
+    assert split_lines("a\x0cb c\n\r\nd\re") == ["a\x0cb c\n", "\r\n", "d\r", "e"]
+    assert split_lines("") == []
+
+
+def test_control_characters_keep_definitions_intact(tmp_path):
+    chunks = CodeChunker(max_chunk_chars=80, min_chunk_chars=0).chunk(SOURCE, "python")
+    first = next(chunk for chunk in chunks if "def first" in chunk.content)
+    assert "return os.sep" in first.content
+    assert first.start_line == 3
+    assert "".join(chunk.content for chunk in chunks) == SOURCE
+
+    path = tmp_path / "paged.py"
+    path.write_bytes(SOURCE.encode('utf-8'))
+    docs = CodeFileLoader(chunk_size=200).load_sync(path, "python")
+    ranges = [(doc.metadata["start_byte"], doc.metadata["end_byte"]) for doc in docs]
+    assert SourceReader(tmp_path).read("paged.py", ranges) == [doc.content for doc in docs]
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from ceylon_rag.interfaces.schemas import Document
+
+from rag.embedding import EmbeddingScheduler
+from rag.embedding_cache import EmbeddingCache
+from rag.metrics import METRICS
+
+
+class FlakyEmbedder:
+    """Fails each text's first `transient` calls, and always fails texts in `broken`"""
+
+    def __init__(self, transient: int = 0, broken=()):
+        self.transient = transient
+        self.broken = set(broken)
+        self.attempts = {}
+        self.embedded = []
+
+    async def embed_documents(self, documents):
+        texts = [doc.content for doc in documents]
+        for text in texts:
+            self.attempts[text] = self.attempts.get(text, 0) + 1
+        if self.broken.intersection(texts):
+            raise ConnectionError("model server unavailable")
+        if any(self.attempts[text] <= self.transient for text in texts):
+            raise TimeoutError("rate limited")
+        self.embedded.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def make_documents(*texts):
+    return [Document(content=text, metadata={}) for text in texts]
+
+
+def scheduler(embedder, **kwargs):
+    return EmbeddingScheduler(embedder, max_batch_size=2, max_retries=3, backoff_base=0.001, **kwargs)
+
+
+def test_transient_failures_are_retried_per_batch():
+    embedder = FlakyEmbedder(transient=2)
+    retries = METRICS.snapshot()["counters"].get("embed.retries", 0)
+
+    embeddings = asyncio.run(scheduler(embedder).embed_documents(make_documents("a", "bb", "ccc")))
+    assert [embedding[0] for embedding in embeddings] == [1.0, 2.0, 3.0]
+    # Both batches failed twice, then went through once
+    assert embedder.attempts == {"a": 3, "bb": 3, "ccc": 3}
+    assert METRICS.snapshot()["counters"]["embed.retries"] == retries + 4
+
+
+def test_permanent_failure_keeps_completed_batches_cached(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings.db")
+    embedder = FlakyEmbedder(broken={"ccc"})
+    documents = make_documents("a", "bb", "ccc", "dddd")
+
+    with pytest.raises(RuntimeError, match="after 4 attempts"):
+        asyncio.run(scheduler(embedder, cache=cache).embed_documents(documents))
+    assert embedder.embedded == ["a", "bb"]
+
+    # Once the server is back, only the failed batch is embedded again
+    embedder.broken.clear()
+    embeddings = asyncio.run(scheduler(embedder, cache=cache).embed_documents(documents))
+    assert [embedding[0] for embedding in embeddings] == [1.0, 2.0, 3.0, 4.0]
+    assert embedder.embedded == ["a", "bb", "ccc", "dddd"]
+    cache.close()
@@ -0,0 +1,54 @@
+import pickle
+import sqlite3
+from types import SimpleNamespace
+
+from rag.embedding_cache import EmbeddingCache
+
+
+def table_totals(cache: EmbeddingCache):
+    count, size = cache._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+    return {"entries": count, "bytes": size}
+
+
+def test_running_totals_follow_puts_and_eviction(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings.db", max_entries=10)
+    cache.put_many({f"key-{index}": [float(index)] * 4 for index in range(8)})
+    # Replacing entries must not count them twice
+    cache.put_many({f"key-{index}": [float(index)] * 8 for index in range(4)})
+    stats = cache.stats()
+    assert {"entries": stats["entries"], "bytes": stats["bytes"]} == table_totals(cache)
+    assert stats["entries"] == 8
+
+    cache.put_many({f"new-{index}": [0.0] for index in range(4)})
+    stats = cache.stats()
+    assert {"entries": stats["entries"], "bytes": stats["bytes"]} == table_totals(cache)
+    assert stats["entries"] == 9
+    cache.close()
+
+    reopened = EmbeddingCache(tmp_path / "embeddings.db", max_entries=10)
+    assert reopened.stats()["entries"] == 9
+    reopened.close()
+
+
+def test_vectors_are_stored_as_float32(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings.db")
+    cache.put_many({"plain": [0.5, -1.25, 3.0], "model": SimpleNamespace(vector=[1.0, 2.0], doc_id="a")})
+    found = cache.get_many(["plain", "model", "missing"])
+    assert {key: list(vector) for key, vector in found.items()} == {"plain": [0.5, -1.25, 3.0], "model": [1.0, 2.0]}
+    assert cache.stats()["bytes"] == 5 * 4
+    cache.close()
+
+
+def test_pickled_entries_of_the_previous_version_are_dropped(tmp_path):
+    path = tmp_path / "embeddings.db"
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE embeddings (key TEXT PRIMARY KEY, value BLOB NOT NULL,"
+                 " size INTEGER NOT NULL, last_used REAL NOT NULL)")
+    conn.execute("INSERT INTO embeddings VALUES (?, ?, ?, ?)", ("old", pickle.dumps([1.0]), 10, 0.0))
+    conn.commit()
+    conn.close()
+
+    cache = EmbeddingCache(path)
+    assert cache.get_many(["old"]) == {}
+    assert cache.stats()["entries"] == 0
+    cache.close()
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from rag.store import build_filter
+from tests.helpers import open_rag
+
+FILES = {
+    "src/app/main.py": "def start_server():\n    return serve_requests()\n",
+    "src/app/util.js": "function startServer() {\n  return serveRequests();\n}\n",
+    "docs/server.md": "# Server\n\nHow to start the server.\n",
+}
+
+
+def test_unknown_criterion_is_rejected():
+    with pytest.raises(ValueError):
+        build_filter({"author": "someone"})
+
+
+def test_filtered_search(tmp_path):
+    repo = tmp_path / "repo"
+    for path, text in FILES.items():
+        (repo / path).parent.mkdir(parents=True, exist_ok=True)
+        (repo / path).write_text(text)
+
+    async def search(rag, criteria):
+        results = await rag.retrieve("start the server", criteria, top_k=10, retrieval="vector")
+        return sorted({doc.metadata["file_path"] for doc in results})
+
+    async def run():
+        rag = await open_rag(tmp_path)
+        try:
+            await rag.index_codebase(repo)
+            assert await search(rag, None) == sorted(FILES)
+            assert await search(rag, {"language": "python"}) == ["src/app/main.py"]
+            assert await search(rag, {"extension": [".js", "md"]}) == ["docs/server.md", "src/app/util.js"]
+            assert await search(rag, {"path_prefix": "src/"}) == ["src/app/main.py", "src/app/util.js"]
+            assert await search(rag, {"path_glob": "**/*.md"}) == ["docs/server.md"]
+            assert await search(rag, {"code_type": "source", "file_path": "src/app/util.js"}) == \
+                ["src/app/util.js"]
+        finally:
+            await rag.close()
+
+    asyncio.run(run())
@@ -0,0 +1,220 @@
+import asyncio
+
+import pytest
+
+from rag.manifest import FileManifest
+from rag.metrics import METRICS
+from tests.helpers import open_rag
+
+SOURCE = '''import json
+
+
+def parse_config(path):
+    """Read the JSON settings file"""
+    with open(path) as f:
+        return json.load(f)
+
+
+class ConfigStore:
+    def save(self, path, data):
+        with open(path, "w") as f:
+            json.dump(data, f)
+'''
+
+
+def test_index_real_file(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "config.py").write_text(SOURCE)
+
+    async def run():
+        rag = await open_rag(tmp_path)
+        try:
+            counts = await rag.index_codebase(repo)
+            assert counts["files"] == 1
+            assert counts["documents"] > 0
+            assert rag.manifest.get("config.py").chunk_ids
+
+            results = await rag.retrieve("parse_config", top_k=2, retrieval="vector")
+            assert results
+            assert results[0].metadata["file_path"] == "config.py"
+            assert "def parse_config" in "".join(doc.content for doc in results)
+
+            # Unchanged files are not indexed again
+            counts = await rag.index_codebase(repo)
+            assert counts["files"] == 0
+        finally:
+            await rag.close()
+
+    asyncio.run(run())
+
+
+def test_manifest_persists_string_chunk_ids(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "config.py").write_text(SOURCE)
+
+    async def run():
+        rag = await open_rag(tmp_path)
+        try:
+            documents = await rag.process_codebase(repo)
+            await rag.index_code(documents)
+        finally:
+            await rag.close()
+
+    asyncio.run(run())
+    manifest = FileManifest(tmp_path / "lancedb" / "test.manifest.json").load()
+    chunk_ids = manifest.get("config.py").chunk_ids
+    assert chunk_ids and all(isinstance(chunk_id, str) for chunk_id in chunk_ids)
+
+
+def test_new_root_replaces_previous_rows(tmp_path):
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+    (first / "config.py").write_text(SOURCE)
+    (second / "other.py").write_text("def other_helper():\n    return 1\n")
+
+    async def run():
+        rag = await open_rag(tmp_path)
+        try:
+            await rag.index_codebase(first)
+            await rag.index_codebase(second)
+            results = await rag.retrieve("parse_config", top_k=5, retrieval="vector")
+            assert {doc.metadata["file_path"] for doc in results} == {"other.py"}
+        finally:
+            await rag.close()
+
+    asyncio.run(run())
+
+
+def test_failed_write_stops_every_stage(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    for index in range(20):
+        (repo / f"module_{index}.py").write_text(SOURCE)
+
+    async def run():
+        rag = await open_rag(tmp_path, index_batch_size=2, store_batch_rows=1)
+
+        async def fail(batches):
+            raise OSError("disk full")
+
+        rag.code_table.append = fail
+        try:
+            try:
+                await rag.index_codebase(repo)
+            except OSError:
+                pass
+            else:
+                raise AssertionError("the write error was swallowed")
+            # No loader, embedder or queue producer task outlives the failed run
+            assert asyncio.all_tasks() == {asyncio.current_task()}
+        finally:
+            await rag.close()
+
+    asyncio.run(run())
+
+
+def test_changed_file_keeps_its_rows_until_the_flush(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "config.py").write_text(SOURCE)
+
+    async def run():
+        rag = await open_rag(tmp_path)
+        try:
+            await rag.index_codebase(repo)
+            (repo / "config.py").write_text(SOURCE.replace("parse_config", "zephyr_quokka"))
+
+            flush = rag._flush_writes
+
+            async def checked_flush():
+                # Buffered replacements are not searchable yet, so neither are their postings
+                assert rag.lexical_index.search("zephyr_quokka", limit=5) == []
+                assert await rag.retrieve("parse_config", top_k=5, retrieval="vector")
+                return await flush()
+
+            rag._flush_writes = checked_flush
+            await rag.index_codebase(repo)
+            results = await rag.retrieve("zephyr_quokka", top_k=5, retrieval="lexical")
+            assert results and all("parse_config" not in doc.content for doc in results)
+        finally:
+            await rag.close()
+
+    asyncio.run(run())
+
+
+def test_progress_counts_only_written_batches(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    for index in range(6):
+        (repo / f"module_{index}.py").write_text(SOURCE)
+
+    async def run():
+        rag = await open_rag(tmp_path, index_batch_size=1, store_batch_rows=1)
+        append = rag.code_table.append
+        writes = []
+
+        async def fail_third(batches):
+            if len(writes) == 2:
+                raise OSError("disk full")
+            await append(batches)
+            writes.append(batches)
+
+        reports = []
+        rag.code_table.append = fail_third
+        try:
+            try:
+                await rag.index_codebase(repo, progress_callback=reports.append)
+            except OSError:
+                pass
+            assert [report["batches"] for report in reports] == [1, 2]
+            assert reports[-1]["files"] == len(rag.manifest.files)
+        finally:
+            await rag.close()
+
+    asyncio.run(run())
+
+
+def test_only_files_with_chunks_get_ids(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "config.py").write_text(SOURCE)
+
+    async def run():
+        rag = await open_rag(tmp_path)
+        try:
+            await rag.index_codebase(repo)
+            (repo / "empty.py").write_text("")
+            (repo / "logo.py").write_bytes(b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR" * 64)
+            (repo / "util.py").write_text("def helper():\n    return 1\n")
+            await rag.index_changes(repo, ["empty.py", "logo.py", "util.py"])
+            assert set(rag.file_ids.ids) == {"config.py", "util.py"}
+        finally:
+            await rag.close()
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("load_mode", ["async", "process"])
+def test_load_and_chunk_are_timed_separately(tmp_path, load_mode):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    for index in range(3):
+        (repo / f"module_{index}.py").write_text(SOURCE)
+
+    def counts():
+        spans = METRICS.snapshot()["spans"]
+        return [spans.get(name, {}).get("count", 0) for name in ("index.load", "index.chunk")]
+
+    async def run():
+        rag = await open_rag(tmp_path, load_mode=load_mode, max_workers=2)
+        try:
+            before = counts()
+            await rag.index_codebase(repo)
+            assert counts() == [before[0] + 3, before[1] + 3]
+        finally:
+            await rag.close()
+
+    asyncio.run(run())
@@ -0,0 +1,38 @@
+from rag.chunks import Chunk, FileInfo
+from rag.lexical import LexicalIndex
+
+
+def test_saves_only_changed_files_and_reloads(tmp_path):
+    path = tmp_path / "code.lexical.db"
+    index = LexicalIndex(path)
+    index.add("a.py", "a-0", "def parse_config(path): pass")
+    index.add("b.py", "b-0", "class ConfigStore: pass")
+    index.add("c.py", "c-0", "def render_page(): pass")
+    index.save()
+
+    index.remove_files(["b.py"])
+    index.add("a.py", "a-1", "def load_settings(): pass")
+    assert index._dirty_files == {"a.py", "b.py"}
+    index.save()
+    index.close()
+
+    reloaded = LexicalIndex(path).load()
+    assert len(reloaded) == 3
+    assert reloaded.total_length == index.total_length
+    for query in ("parse_config", "config store", "settings", "render"):
+        assert reloaded.search(query) == index.search(query)
+    reloaded.clear()
+    reloaded.save()
+    reloaded.close()
+    assert not len(LexicalIndex(path).load())
+
+
+def test_chunks_are_indexed_under_their_file(tmp_path):
+    index = LexicalIndex(tmp_path / "code.lexical.db")
+    info = FileInfo.create(1, "src/config.py", "python")
+    index.add_documents([Chunk(info, "config-0", "def parse_config(path): pass", 0, 1, 1),
+                         Chunk(info, "config-1", "def load_settings(): pass", 1, 2, 2)])
+    assert [doc_id for doc_id, _ in index.search("parse_config")] == ["config-0"]
+    index.remove_files(["src/config.py"])
+    assert not len(index)
+    index.close()
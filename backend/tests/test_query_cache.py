@@ -0,0 +1,40 @@
+import asyncio
+
+from rag.metrics import METRICS
+from tests.helpers import open_rag
+
+
+def test_query_embedding_is_computed_once_and_only_when_needed(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "config.py").write_text("def parse_config(path):\n    return open(path).read()\n")
+
+    async def run():
+        rag = await open_rag(tmp_path, query_cache={"enabled": True})
+        try:
+            await rag.index_codebase(repo)
+
+            before = METRICS.snapshot()["counters"].get("embed.queries", 0)
+            await rag.analyze_code("How is the configuration file read?", retrieval="vector")
+            assert METRICS.snapshot()["counters"]["embed.queries"] == before + 1
+
+            # Symbol lookups and lexical retrieval never embed the question
+            await rag.analyze_code("parse_config", retrieval="hybrid")
+            await rag.analyze_code("configuration file", retrieval="lexical")
+            assert METRICS.snapshot()["counters"]["embed.queries"] == before + 1
+
+            # Re-indexing a file invalidates only the answers drawn from it
+            result = await rag.analyze_code("How is the configuration file read?", retrieval="vector")
+            assert result.metadata.get("cache_hit")
+            (repo / "README.md").write_text("# Notes\n")
+            await rag.index_changes(repo, ["README.md"])
+            result = await rag.analyze_code("How is the configuration file read?", retrieval="vector")
+            assert result.metadata.get("cache_hit")
+            (repo / "config.py").write_text("def parse_config(path):\n    return path\n")
+            await rag.index_codebase(repo)
+            result = await rag.analyze_code("How is the configuration file read?", retrieval="vector")
+            assert not result.metadata.get("cache_hit")
+        finally:
+            await rag.close()
+
+    asyncio.run(run())
@@ -0,0 +1,35 @@
+import asyncio
+
+from bench.stubs import StubEmbedder, StubLLM
+from rag.app import SharedClients
+from rag.embedding import EmbeddingScheduler
+from rag.registry import ProjectRegistry
+from tests.helpers import make_config
+
+
+def test_pinned_instances_are_not_evicted(tmp_path):
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+
+    async def run():
+        registry = ProjectRegistry(make_config(tmp_path), pool_size=1)
+        embedder = StubEmbedder(dimension=32)
+        registry.clients = SharedClients(StubLLM(), embedder, None, EmbeddingScheduler(embedder))
+        try:
+            current = await registry.open(first, pin=True)
+            async with registry.pinned(current):
+                await registry.open(second)
+                # Over size, but the only unpinned instance is the one just opened
+                assert [project["open"] for project in registry.list_projects()] == [True, True]
+
+            # The current project stays pinned after the request, so the other one goes
+            assert [project["open"] for project in registry.list_projects()] == [False, True]
+
+            await registry.release(current)
+            await registry.open(second)
+            assert [project["open"] for project in registry.list_projects()] == [True, False]
+        finally:
+            await registry.close()
+
+    asyncio.run(run())
@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from rag.rerank import Reranker
+
+
+def test_mmr_prefers_diverse_chunks_and_drops_duplicates():
+    # a, its near-duplicate, b close to a, c and d orthogonal to both
+    vectors = np.array([[1.0, 0.0, 0.0],
+                        [1.0, 0.01, 0.0],
+                        [0.95, 0.31, 0.0],
+                        [0.0, 0.0, 1.0],
+                        [0.0, 1.0, 0.0]])
+    relevance = np.array([1.0, 0.99, 0.95, 0.85, 0.0])
+    files = ["a.py", "b.py", "c.py", "d.py", "e.py"]
+
+    selected = Reranker(file_penalty=0.0).select(relevance, vectors, files, top_k=5)
+    assert selected == [0, 3, 2, 4]
+    # Pure relevance keeps the similar chunk ahead of the diverse one
+    assert Reranker(mmr_lambda=1.0, file_penalty=0.0, duplicate_threshold=1.1) \
+        .select(relevance, vectors, files, top_k=5) == [0, 1, 2, 3, 4]
+
+
+def test_file_penalty_spreads_picks_across_files():
+    vectors = np.eye(4)
+    relevance = np.array([1.0, 0.9, 0.88, 0.0])
+    files = ["a.py", "a.py", "b.py", "c.py"]
+
+    assert Reranker(file_penalty=0.05).select(relevance, vectors, files, top_k=3) == [0, 2, 1]
+    assert Reranker(file_penalty=0.0).select(relevance, vectors, files, top_k=3) == [0, 1, 2]
+
+
+def test_query_terms_and_symbols_outrank_raw_similarity():
+    documents = [
+        SimpleNamespace(content="return value", metadata={"file_path": "a.py"}),
+        SimpleNamespace(content="def parse_config(path):", metadata={"file_path": "b.py", "symbol": "parse_config"}),
+        SimpleNamespace(content="unrelated", metadata={"file_path": "c.py"}),
+    ]
+    vectors = np.array([[1.0, 0.0, 0.0], [0.9, 0.44, 0.0], [0.0, 0.0, 1.0]])
+
+    ranked = Reranker().rerank("parse_config", documents, vectors, [1.0, 0.0, 0.0], top_k=2)
+    assert [index for index, _ in ranked] == [1, 0]
+    assert ranked[0][1] > ranked[1][1]
@@ -0,0 +1,44 @@
+import pytest
+
+from rag.sniff import FileSniffer
+
+SOURCE = "def main():\n    return 0\n"
+
+CASES = {
+    "plain.py": (SOURCE, None),
+    "vendor.min.js": ("var a=1;\n", "minified"),
+    "app.bundle.js": ("var a=1;\n", "minified"),
+    "one_line.js": ("var a=" + "1+" * 300 + "1;\n", "minified"),
+    "messages_pb2.py": (SOURCE, "generated"),
+    "api.pb.go": ("package api\n", "generated"),
+    "client.py": ("# Code generated by openapi-generator. DO NOT EDIT.\n" + SOURCE, "generated"),
+    "late_marker.py": (SOURCE * 10 + "# @generated\n", None),
+    "big.py": (SOURCE * 100, "too_large"),
+    "image.png": (b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR", "binary"),
+}
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_sniff_classifies_files(tmp_path, name):
+    content, reason = CASES[name]
+    path = tmp_path / name
+    if isinstance(content, bytes):
+        path.write_bytes(content)
+    else:
+        path.write_text(content)
+    sniffer = FileSniffer(max_file_bytes=1000, header_lines=5)
+    assert sniffer.sniff(path) == reason
+
+
+def test_long_lines_cut_by_the_block_do_not_count_as_minified(tmp_path):
+    # Short lines followed by a long final line only partly read into the block
+    path = tmp_path / "data.py"
+    path.write_text(SOURCE * 20 + "x = '" + "a" * 20000 + "'\n")
+    assert FileSniffer(sniff_bytes=1024).sniff(path) is None
+
+
+def test_known_size_skips_the_stat(tmp_path):
+    path = tmp_path / "plain.py"
+    path.write_text(SOURCE)
+    assert FileSniffer(max_file_bytes=10).sniff(path, size=5) is None
+    assert FileSniffer(max_file_bytes=10).sniff(path, size=50) == "too_large"
@@ -0,0 +1,68 @@
+import asyncio
+from datetime import datetime
+
+import lancedb
+import numpy as np
+
+from rag.chunks import Chunk, ChunkBatch, FileInfo
+from rag.store import CodeTable
+
+
+def make_batch(file_id: int, path: str, count: int, dimension: int = 8):
+    info = FileInfo.create(file_id, path, "python")
+    chunks = [Chunk(info, f"{path}-{index}", f"def f{index}(): pass\n", index, index + 1, index + 1)
+              for index in range(count)]
+    vectors = np.random.default_rng(file_id).normal(size=(count, dimension)).astype(np.float32)
+    return ChunkBatch.from_chunks(chunks).to_arrow(vectors)
+
+
+def test_factory_layout_table_is_replaced(tmp_path):
+    db = lancedb.connect(str(tmp_path))
+    db.create_table("code", data=[{
+        "text": "x", "vector": [0.0] * 8, "doc_id": "1", "metadata_title": "",
+        "metadata_url": "a.py", "metadata_index": 1, "created_at": datetime.utcnow().isoformat()
+    }])
+
+    async def run():
+        table = CodeTable(tmp_path, "code")
+        assert not await table.check_schema()
+        assert await table.check_schema()
+
+        await table.append([make_batch(1, "a.py", 3), make_batch(2, "b.py", 2)])
+        await table.delete_files([1])
+        rows = await table.search(np.zeros(8), limit=10)
+        assert sorted(row["file_path"] for row in rows) == ["b.py", "b.py"]
+
+    asyncio.run(run())
+
+
+def test_append_after_deleting_every_row(tmp_path):
+    async def run():
+        table = CodeTable(tmp_path, "code")
+        await table.append([make_batch(1, "a.py", 2)])
+        await table.delete_files([1])
+        # An emptied table is still there and must be appended to, not recreated
+        await table.append([make_batch(2, "b.py", 3)])
+        assert [row["file_path"] for row in await table.fetch(["b.py-0"])] == ["b.py"]
+
+    asyncio.run(run())
+
+
+def test_table_is_optimized_on_schedule_without_vector_index(tmp_path):
+    settings = {"optimize_every": 3, "cleanup_older_than": 0}
+
+    async def run():
+        table = CodeTable(tmp_path, "code")
+        await table.append([make_batch(1, "a.py", 3)])
+        await table.append([make_batch(2, "b.py", 2)])
+        assert not await table.optimize(settings)
+        await table.delete_files([1])
+        assert await table.maintain_vector_index() == "brute_force"
+        assert await table.optimize(settings)
+        assert not await table.optimize(settings)
+
+        lance_table = lancedb.connect(str(tmp_path)).open_table("code")
+        assert len(lance_table.list_versions()) == 1
+        assert lance_table.count_rows() == 2
+
+    asyncio.run(run())
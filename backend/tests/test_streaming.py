@@ -0,0 +1,24 @@
+import asyncio
+
+from rag.metrics import METRICS
+from tests.helpers import open_rag
+
+
+def test_analysis_streams_through_streaming_generate(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "server.py").write_text("def start_server(port):\n    return serve(port)\n")
+
+    async def run():
+        rag = await open_rag(tmp_path)
+        try:
+            await rag.index_codebase(repo)
+            before = METRICS.snapshot()["spans"].get("query.first_token", {}).get("count", 0)
+            tokens = [token async for token in rag.analyze_code_stream("How does the server start?")]
+        finally:
+            await rag.close()
+        # The completion arrives token by token, not as one generated response
+        assert tokens == [f"token{number} " for number in range(rag.llm.tokens)]
+        assert METRICS.snapshot()["spans"]["query.first_token"]["count"] == before + 1
+
+    asyncio.run(run())
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from rag.metrics import METRICS
+from wa_async import WVAsync
+
+
+async def start(wv: WVAsync):
+    loop_task = asyncio.create_task(wv._main_loop())
+    while wv._loop is None:
+        await asyncio.sleep(0)
+    return loop_task
+
+
+async def stop(wv: WVAsync, loop_task):
+    await wv.jq.async_q.put({'type': 'closing'})
+    await loop_task
+
+
+async def wait_for(predicate):
+    while not predicate():
+        await asyncio.sleep(0.001)
+
+
+def call(wv: WVAsync, name, arg=None):
+    """Call like JavaScript does, blocking a worker thread until the result is in"""
+    return asyncio.to_thread(wv.js_api.call, name, arg)
+
+
+def test_identical_calls_share_one_run():
+    async def run():
+        wv = WVAsync()
+        release = asyncio.Event()
+        runs = []
+
+        async def analyze(arg):
+            runs.append(arg)
+            await release.wait()
+            return f"answer to {arg}"
+
+        wv.registry("analyze", analyze, coalesce=True)
+        loop_task = await start(wv)
+        coalesced = METRICS.snapshot()["counters"].get("rpc.coalesced", 0)
+
+        calls = [asyncio.ensure_future(call(wv, "analyze", question))
+                 for question in ("how", "how", "why", "how")]
+        await wait_for(lambda: len(wv._calls) == 4)
+        release.set()
+        assert await asyncio.gather(*calls) == ["answer to how", "answer to how", "answer to why", "answer to how"]
+        assert sorted(runs) == ["how", "why"]
+        assert METRICS.snapshot()["counters"]["rpc.coalesced"] == coalesced + 2
+        await stop(wv, loop_task)
+
+    asyncio.run(run())
+
+
+def test_calls_over_max_pending_are_rejected():
+    async def run():
+        wv = WVAsync(max_pending=2)
+        release = asyncio.Event()
+
+        async def process(arg):
+            await release.wait()
+            return arg
+
+        # One slot, so the second call waits for the first and both count as pending
+        wv.registry("process", process, max_concurrency=1)
+        loop_task = await start(wv)
+
+        accepted = [asyncio.ensure_future(call(wv, "process", number)) for number in range(2)]
+        await wait_for(lambda: wv._active == 2)
+        with pytest.raises(RuntimeError, match="Too many pending requests"):
+            await call(wv, "process", 2)
+
+        release.set()
+        assert await asyncio.gather(*accepted) == [0, 1]
+        # Finished calls free their place
+        assert await call(wv, "process", 3) == 3
+        await stop(wv, loop_task)
+
+    asyncio.run(run())
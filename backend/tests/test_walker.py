@@ -0,0 +1,77 @@
+from rag.walker import CodebaseWalker
+
+FILES = [
+    "main.py",
+    "debug.log",
+    "keep.log",
+    "build/out.py",
+    "docs/guide.md",
+    "docs/api/index.md",
+    "lib/cache",
+    "src/build/steps.py",
+    "src/cache/entry.py",
+    "src/docs/notes.md",
+    "src/trace.log",
+    "src/important.log",
+    "src/gen/schema.py",
+    "src/pkg/gen/schema.py",
+]
+
+ROOT_IGNORE = """\
+# Comments and blank lines are skipped
+
+*.log
+!keep.log
+/build
+cache/
+docs/*.md
+"""
+
+# Deeper ignore files win over shallower ones and anchor to their own directory
+SRC_IGNORE = """\
+!important.log
+/gen
+"""
+
+INCLUDED = [
+    "keep.log",
+    "lib/cache",
+    "main.py",
+    "docs/api/index.md",
+    "src/build/steps.py",
+    "src/docs/notes.md",
+    "src/important.log",
+    "src/pkg/gen/schema.py",
+]
+
+
+def make_repo(tmp_path):
+    for path in FILES:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text("x\n")
+    (tmp_path / ".gitignore").write_text(ROOT_IGNORE)
+    (tmp_path / "src" / ".gitignore").write_text(SRC_IGNORE)
+    return tmp_path
+
+
+def test_walk_applies_gitignore_semantics(tmp_path):
+    root = make_repo(tmp_path)
+    walked = {relative_path for _, relative_path in CodebaseWalker().walk(root)}
+    assert walked == set(INCLUDED) | {".gitignore", "src/.gitignore"}
+
+
+def test_classify_agrees_with_walk(tmp_path):
+    root = make_repo(tmp_path)
+    walker = CodebaseWalker()
+    decisions = dict(zip(FILES, (included for included, _ in walker.classify(root, FILES))))
+    assert sorted(path for path, included in decisions.items() if included) == sorted(INCLUDED)
+
+
+def test_excluded_directories_are_pruned_by_name_and_path(tmp_path):
+    root = make_repo(tmp_path)
+    walker = CodebaseWalker(excluded_dirs=["docs", "src/pkg"], excluded_extensions=[".log"],
+                            ignore_file_names=())
+    walked = {relative_path for _, relative_path in walker.walk(root)}
+    assert not any(path.startswith(("docs/", "src/docs/", "src/pkg/")) for path in walked)
+    assert not any(path.endswith(".log") for path in walked)
+    assert {"build/out.py", "src/gen/schema.py"} <= walked
@@ -0,0 +1,78 @@
+import asyncio
+
+from rag.watcher import ProjectWatcher
+from tests.helpers import open_rag
+
+
+def make_repo(tmp_path):
+    repo = tmp_path / "repo"
+    (repo / "pkg").mkdir(parents=True)
+    (repo / "config.py").write_text("def parse_config(path):\n    return path\n")
+    (repo / "pkg" / "server.py").write_text("def start_server(port):\n    return port\n")
+    (repo / "pkg" / "client.py").write_text("def open_client(url):\n    return url\n")
+    return repo
+
+
+async def lexical_files(rag, question):
+    results = await rag.retrieve(question, top_k=10, retrieval="lexical")
+    return sorted({doc.metadata["file_path"] for doc in results})
+
+
+def test_index_changes_applies_deltas(tmp_path):
+    repo = make_repo(tmp_path)
+
+    async def run():
+        rag = await open_rag(tmp_path)
+        try:
+            await rag.index_codebase(repo)
+
+            (repo / "config.py").write_text("def load_settings(path):\n    return path\n")
+            (repo / "notes.py").write_text("def write_notes():\n    return None\n")
+            (repo / "pkg" / "client.py").unlink()
+            counts = await rag.index_changes(repo, ["config.py", "notes.py", "pkg/client.py"])
+            assert (counts["files"], counts["removed_files"]) == (2, 1)
+            assert set(rag.manifest.files) == {"config.py", "notes.py", "pkg/server.py"}
+            assert await lexical_files(rag, "parse_config") == []
+            assert await lexical_files(rag, "load_settings") == ["config.py"]
+            assert await lexical_files(rag, "open_client") == []
+
+            # An ignore file edit re-checks the directory it governs
+            (repo / ".gitignore").write_text("pkg/\n")
+            rag.walker.clear_cache()
+            counts = await rag.index_changes(repo, [""])
+            assert counts["removed_files"] == 1
+            assert set(rag.manifest.files) == {"config.py", "notes.py"}
+            assert await lexical_files(rag, "start_server") == []
+
+            # Paths outside the indexed root are not applied
+            other = tmp_path / "other"
+            other.mkdir()
+            assert (await rag.index_changes(other, ["config.py"]))["files"] == 0
+        finally:
+            await rag.close()
+
+    asyncio.run(run())
+
+
+def test_watcher_indexes_saved_files(tmp_path):
+    repo = make_repo(tmp_path)
+
+    async def run():
+        rag = await open_rag(tmp_path)
+        updates = asyncio.Queue()
+        watcher = ProjectWatcher(rag, repo, debounce_ms=50, on_update=updates.put_nowait)
+        try:
+            await rag.index_codebase(repo)
+            watcher.start()
+            # Give the watcher time to subscribe before the first change
+            await asyncio.sleep(0.5)
+            (repo / "pkg" / "server.py").write_text("def zephyr_quokka(port):\n    return port\n")
+            counts = await asyncio.wait_for(updates.get(), timeout=10)
+            assert counts["files"] == 1
+            assert await lexical_files(rag, "zephyr_quokka") == ["pkg/server.py"]
+            assert await lexical_files(rag, "start_server") == []
+        finally:
+            await watcher.stop()
+            await rag.close()
+
+    asyncio.run(run())
@@ -1,48 +1,230 @@
 import asyncio
+import json
+import threading
+import uuid
+from concurrent.futures import Future
 from threading import Thread
 
 import janus
 
+from rag.metrics import METRICS
+
+# Pushes are coalesced and delivered at most once per animation frame
+FRAME_INTERVAL = 1 / 60
+
+
+class _Call:
+    """An in-flight registered function call and the JS callers waiting on it"""
+
+    def __init__(self, name, task):
+        self.name = name
+        self.task = task
+        self.futures = {}  # {call_id: Future}
+
 
 class WVAsync:
-    def __init__(self):
-        self.jq = janus.Queue()
+    def __init__(self, max_pending=64):
+        # Bounded so a flood of UI calls is shed instead of piling up
+        self.jq = janus.Queue(maxsize=max_pending)
+        self.max_pending = max_pending
         self.js_api = JsApi(self.jq)
         self.window = None
         self._t = Thread(target=self._main)
         self._reg = {}  # {fn_name: fn}
+        self._limits = {}  # {fn_name: asyncio.Semaphore}
+        self._max_concurrency = {}  # {fn_name: int}
+        self._coalesce = set()  # fn_names whose identical calls share one task
+        self._calls = {}  # {call_id: _Call}
+        self._by_key = {}  # {(fn_name, arg_key): _Call}
+        self._active = 0  # calls started and not finished, waiting for a slot or running
+        self._loop = None
+        self._push_buffer = []  # [{channel, stream, data}]
+        self._push_lock = threading.Lock()
+        self._push_wakeup = None
+
+    def registry(self, name, fn, max_concurrency=None, coalesce=False):
+        """Expose an async function to JavaScript via `JsApi.call`
 
-    def registry(self, name, fn):
+        `max_concurrency` caps how many calls of `name` run at once (the rest
+        wait their turn); with `coalesce`, a call whose argument matches one
+        that is still pending joins it instead of starting a new task.
+        """
         self._reg[name] = fn
+        if max_concurrency:
+            self._max_concurrency[name] = max_concurrency
+        if coalesce:
+            self._coalesce.add(name)
 
     def _on_closing(self):
         print('closing')
-        self.jq.sync_q.put_nowait({'closing': True})
+        self.jq.sync_q.put({'type': 'closing'})
 
     def start(self, window):
         self.window = window
         self.window.events.closing += self._on_closing
         self._t.start()
 
+    def push(self, channel, data, stream=None):
+        """Queue a message for JavaScript; safe to call from any thread
+
+        Messages are delivered in batches as a `pywebview-push` window event
+        whose `detail` is the list of messages. Consecutive string messages on
+        the same channel and stream are concatenated, so token streams cost
+        one `evaluate_js` per frame rather than one per token.
+        """
+        with self._push_lock:
+            last = self._push_buffer[-1] if self._push_buffer else None
+            if last and last['channel'] == channel and last['stream'] == stream \
+                    and isinstance(last['data'], str) and isinstance(data, str):
+                last['data'] += data
+            else:
+                self._push_buffer.append({'channel': channel, 'stream': stream, 'data': data})
+
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._push_wakeup.set)
+
+    async def _push_loop(self):
+        while True:
+            await self._push_wakeup.wait()
+            # Give the rest of this frame's messages a chance to coalesce
+            await asyncio.sleep(FRAME_INTERVAL)
+            self._push_wakeup.clear()
+            with self._push_lock:
+                batch, self._push_buffer = self._push_buffer, []
+            if batch and self.window is not None:
+                METRICS.inc("push.batches")
+                METRICS.inc("push.messages", len(batch))
+                script = (f"window.dispatchEvent(new CustomEvent('pywebview-push', "
+                          f"{{detail: {json.dumps(batch, default=str)}}}))")
+                try:
+                    # evaluate_js blocks until the webview has run the script
+                    await asyncio.to_thread(self.window.evaluate_js, script)
+                except Exception as e:
+                    print(f"Error pushing to webview: {str(e)}")
+
     def _main(self):
         asyncio.run(self._main_loop())
 
     async def _main_loop(self):
-        while True:  # ret = {name: {value}}
-            ret = await self.jq.async_q.get()
-            print(ret)
-            for fn_name in ret:
-                if fn_name in self._reg:
-                    asyncio.create_task(self._reg[fn_name](ret[fn_name]))
-                    await asyncio.sleep(0)
-            if 'closing' in ret:
+        self._loop = asyncio.get_running_loop()
+        self._push_wakeup = asyncio.Event()
+        self._limits = {name: asyncio.Semaphore(limit) for name, limit in self._max_concurrency.items()}
+        push_task = asyncio.create_task(self._push_loop())
+        if self._push_buffer:
+            self._push_wakeup.set()
+
+        while True:  # msg = {type, id, method, arg, future}
+            msg = await self.jq.async_q.get()
+            print({key: value for key, value in msg.items() if key != 'future'})
+            if msg['type'] == 'call':
+                self._dispatch(msg)
+            elif msg['type'] == 'cancel':
+                self._cancel(msg['id'])
+            elif msg['type'] == 'closing':
                 break
 
+        push_task.cancel()
+        for call in list(self._calls.values()):
+            call.task.cancel()
+
+    def _dispatch(self, msg):
+        name, call_id, future = msg['method'], msg['id'], msg['future']
+        if name not in self._reg:
+            future.set_exception(KeyError(f"Unknown method: {name}"))
+            return
+
+        key = None
+        if name in self._coalesce:
+            key = (name, json.dumps(msg['arg'], sort_keys=True, default=str))
+            if (call := self._by_key.get(key)) is not None:
+                call.futures[call_id] = future
+                self._calls[call_id] = call
+                METRICS.inc("rpc.coalesced")
+                return
+
+        # The queue drains immediately, so the backlog to bound is the started calls
+        if self._active >= self.max_pending:
+            METRICS.inc("rpc.rejected")
+            future.set_exception(RuntimeError(f"Too many pending requests, dropped call to {name}"))
+            return
+
+        self._active += 1
+        call = _Call(name, None)
+        call.futures[call_id] = future
+        call.task = asyncio.create_task(self._run(name, msg['arg']))
+        call.task.add_done_callback(lambda task: self._finish(call, key))
+        self._calls[call_id] = call
+        if key is not None:
+            self._by_key[key] = call
+
+    async def _run(self, name, arg):
+        METRICS.inc("rpc.calls")
+        limit = self._limits.get(name)
+        if limit is None:
+            with METRICS.span(f"rpc.{name}"):
+                return await self._reg[name](arg)
+        # Time spent waiting for a slot is reported separately from the call itself
+        with METRICS.span(f"rpc.{name}.wait"):
+            await limit.acquire()
+        try:
+            with METRICS.span(f"rpc.{name}"):
+                return await self._reg[name](arg)
+        finally:
+            limit.release()
+
+    def _finish(self, call, key):
+        self._active -= 1
+        if key is not None and self._by_key.get(key) is call:
+            del self._by_key[key]
+        for call_id, future in call.futures.items():
+            self._calls.pop(call_id, None)
+            if future.done():
+                continue
+            if call.task.cancelled():
+                future.cancel()
+            elif call.task.exception() is not None:
+                future.set_exception(call.task.exception())
+            else:
+                future.set_result(call.task.result())
+
+    def _cancel(self, call_id):
+        call = self._calls.pop(call_id, None)
+        if call is None:
+            return
+        future = call.futures.pop(call_id)
+        future.cancel()
+        METRICS.inc("rpc.cancelled")
+        # A coalesced task keeps running while other callers still wait on it
+        if not call.futures:
+            call.task.cancel()
+
 
 class JsApi:
     def __init__(self, jq):
         self.jq = jq
 
-    def call(self, rpc_name, d=None):
+    def call(self, rpc_name, d=None, call_id=None):
+        """Run a registered function and return its result to the JS Promise
+
+        pywebview runs each JS API call on its own thread, so this blocks
+        until the async function completes; its exception (or cancellation)
+        rejects the Promise. Pass a `call_id` to be able to `cancel` the call.
+        """
         print(rpc_name, d)
-        self.jq.sync_q.put_nowait({rpc_name: d})
+        future = Future()
+        try:
+            self.jq.sync_q.put_nowait({
+                'type': 'call',
+                'id': call_id or uuid.uuid4().hex,
+                'method': rpc_name,
+                'arg': d,
+                'future': future
+            })
+        except janus.SyncQueueFull:
+            METRICS.inc("rpc.rejected")
+            raise RuntimeError(f"Too many pending requests, dropped call to {rpc_name}")
+        return future.result()
+
+    def cancel(self, call_id):
+        """Cancel a pending call started with the given `call_id`"""
+        self.jq.sync_q.put_nowait({'type': 'cancel', 'id': call_id})